@@ -0,0 +1,134 @@
+#!/usr/bin/env python3.8
+
+import argparse
+import fnmatch
+import json
+import os
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, as_completed, wait
+
+import checks  # registers the rules
+from rules import RULES, Scan, check_result
+from running_config import RunningConfig
+
+# Files handed to a worker process at once, to keep the pool busy without a
+# round trip per file.
+BATCH = 64
+
+
+def config_rules(keyword=None):
+    """Rules that only read the running-config, so they can run on a backup."""
+    return [name for name, rule in RULES.items()
+            if set(rule.needs) <= {'running_config'} and
+            (keyword is None or keyword in name)]
+
+
+def config_files(directory, pattern="*"):
+    for root, dirs, files in os.walk(directory):
+        dirs[:] = sorted(name for name in dirs if not name.startswith('.'))
+        for name in sorted(files):
+            if not name.startswith('.') and fnmatch.fnmatch(name, pattern):
+                yield os.path.join(root, name)
+
+
+def audit_file(path, names):
+    report = {"file": path}
+    try:
+        # The configuration is indexed row by row while it is read.
+        with open(path, encoding="utf-8", errors="replace") as file:
+            running_config = RunningConfig(file)
+    except OSError as error:
+        report["error"] = str(error)
+        return report
+    if not any(row.startswith(('hostname ', 'version ')) for row in running_config.lines):
+        # Empty, binary or anything else the rules would flag as a bare switch.
+        report["error"] = "not a configuration: no hostname or version line"
+        return report
+    if running_config.unclosed:
+        report["error"] = "banner {} is never closed, the rest of the file is part of it" \
+            .format(running_config.unclosed)
+        return report
+    hostname = running_config.include('hostname ')
+    if hostname:
+        report["hostname"] = hostname[0].split(" ")[1]
+    scan = Scan(None, {'running_config': running_config})
+    report["checks"] = {name: check_result(scan, name) for name in names}
+    return report
+
+
+def audit_batch(paths, names):
+    return [audit_file(path, names) for path in paths]
+
+
+def batches(paths, size=BATCH):
+    batch = []
+    for path in paths:
+        batch.append(path)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def audit_directory(directory, names, pattern="*", jobs=None):
+    """Reports of every configuration file of `directory`, in no particular order.
+
+    The files are spread over `jobs` worker processes, all cores by default.
+    Only a few batches per worker are queued at a time, so walking a huge
+    directory does not queue every file up front.
+    """
+    jobs = jobs or os.cpu_count()
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        pending = set()
+        for batch in batches(config_files(directory, pattern)):
+            if len(pending) >= 4 * jobs:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield from future.result()
+            pending.add(pool.submit(audit_batch, batch, names))
+        for future in as_completed(pending):
+            yield from future.result()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run the running-config checks on a directory of saved configurations.")
+    parser.add_argument("directory", help="directory of configuration backups, walked recursively")
+    parser.add_argument("-o", "--output", default="audit_results.json",
+                        help="where to write the consolidated report")
+    parser.add_argument("-k", dest="keyword", help="only run checks matching this substring")
+    parser.add_argument("-p", "--pattern", default="*",
+                        help="only read files matching this glob, e.g. '*.cfg'")
+    parser.add_argument("-j", "--jobs", type=int, help="worker processes, all cores by default")
+    options = parser.parse_args()
+
+    names = config_rules(options.keyword)
+    start = time.time()
+    failed, warned, errors, files = Counter(), Counter(), 0, 0
+    # The report is written as the files are audited, it is never held whole.
+    with open(options.output, "w") as output:
+        output.write('{"checks": ' + json.dumps(names) + ', "files": [')
+        for report in audit_directory(options.directory, names, options.pattern,
+                                      options.jobs):
+            output.write((",\n" if files else "\n") + json.dumps(report))
+            files += 1
+            if "error" in report:
+                errors += 1
+                continue
+            for name, result in report["checks"].items():
+                failed[name] += result["result"] == "failed"
+                warned[name] += "warnings" in result
+        summary = {name: {"failed": failed[name], "warnings": warned[name]} for name in names}
+        output.write('\n], "summary": ' + json.dumps(summary, indent=4) + '}\n')
+
+    for name in names:
+        print("{:<40} {:>8} failed {:>8} with warnings".format(
+            name, failed[name], warned[name]))
+    print("{} files audited in {:.1f}s ({} unreadable or not configurations), "
+          "report in {}".format(files, time.time() - start, errors, options.output))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3.8
+
+import argparse
+import json
+import time
+
+from emulator import Device, Emulator
+from rules import Scan, all_checks, check_result
+from pool import make_pool
+
+
+def measure(emulator, action):
+    """Wall time and emulator traffic of one action."""
+    before = emulator.stats.snapshot()
+    start = time.perf_counter()
+    action()
+    wall = time.perf_counter() - start
+    traffic = emulator.stats.snapshot()
+    traffic.subtract(before)
+    return {
+        "wall": round(wall, 4),
+        "round_trips": traffic["commands"] + traffic["pages"],
+        "bytes": traffic["bytes_in"] + traffic["bytes_out"],
+        "logins": traffic["logins"],
+    }
+
+
+def benchmark(emulator, device, checks):
+    """Cost of the login, of every check on its own and of a full scan."""
+    results = {"checks": {}}
+    for check in checks:
+        session = make_pool(device)
+        login = measure(emulator, session.open)
+        results.setdefault("login", login)
+        scan = Scan(session)
+        results["checks"][check] = measure(emulator, lambda: check_result(scan, check))
+        session.close()
+
+    def full_scan():
+        session = make_pool(device).open()
+        scan = Scan(session)
+        scan.collect(checks)
+        for check in checks:
+            check_result(scan, check)
+        session.close()
+
+    results["scan"] = measure(emulator, full_scan)
+    return results
+
+
+def report(results):
+    row = "{:<45} {:>9} {:>12} {:>10} {:>7}"
+    print(row.format("", "wall (s)", "round trips", "bytes", "logins"))
+    rows = [("login", results["login"])] + sorted(results["checks"].items()) + \
+        [("full scan", results["scan"])]
+    for name, cost in rows:
+        print(row.format(name, cost["wall"], cost["round_trips"], cost["bytes"], cost["logins"]))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the scanner against an emulated switch.")
+    parser.add_argument("--ports", type=int, default=48, help="number of switch ports")
+    parser.add_argument("--vlans", type=int, default=100, help="number of VLANs")
+    parser.add_argument("--latency", type=float, default=0.005,
+                        help="seconds the switch waits before answering each command")
+    parser.add_argument("--no-paging", action="store_true",
+                        help="never stop long outputs at --More--")
+    parser.add_argument("--sessions", type=int, default=1,
+                        help="vty sessions the scanner opens to the switch")
+    parser.add_argument("-k", dest="keyword", help="only run checks matching this substring")
+    parser.add_argument("--json", metavar="FILE", help="also write the results to FILE")
+    options = parser.parse_args()
+
+    emulator = Emulator(Device(ports=options.ports, vlans=options.vlans),
+                        latency=options.latency, paging=not options.no_paging)
+    host, port = emulator.serve_telnet()
+    device = {"IP": host, "PROTOCOL": "telnet", "PORT": port,
+              "SWITCH_PASSWORD": "cisco", "ENABLE_PASSWD": "cisco",
+              "SESSIONS": options.sessions}
+    try:
+        results = benchmark(emulator, device, all_checks(options.keyword))
+    finally:
+        emulator.stop()
+    report(results)
+    if options.json:
+        with open(options.json, "w") as file:
+            json.dump(results, file, indent=4)
+
+
+if __name__ == "__main__":
+    main()
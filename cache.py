@@ -0,0 +1,143 @@
+#!/usr/bin/env python3.8
+
+import hashlib
+import json
+import threading
+import time
+
+import regex as re
+
+from session import CommandTimeout, command_output
+
+# Tells whether the configuration changed without building it again, which a
+# `show running-config`, even filtered, does. Platforms with a cheaper or more
+# reliable answer are listed by model prefix, as read by `show version`; an
+# inventory entry can also name its own in "CHANGE_PROBE".
+CHANGE_PROBE = 'show logging | include %SYS-5-CONFIG_I'
+CHANGE_PROBES = {
+    "C9": 'show configuration id',
+}
+# IOS errors, e.g. a probe the platform does not know, start with "% ".
+RE_REJECTED = re.compile(r"^% ", re.MULTILINE)
+MAX_AGE = 7 * 24 * 3600
+MAX_DEVICES = 10000
+
+
+def device_key(device):
+    return device.get("NAME") or device["IP"]
+
+
+def change_probe(device, version=None):
+    """Command whose output changes with the configuration of `device`."""
+    if device.get("CHANGE_PROBE"):
+        return device["CHANGE_PROBE"]
+    model = version.model if version else ""
+    return next((command for prefix, command in CHANGE_PROBES.items()
+                 if model.startswith(prefix)), CHANGE_PROBE)
+
+
+def run_probe(scan, command):
+    """Answer of the change probe, empty when the switch rejected it or timed out."""
+    try:
+        probe = command_output(scan.run(command)).strip()
+    except CommandTimeout:
+        return ""
+    return "" if RE_REJECTED.search(probe) else probe
+
+
+def comparable(output):
+    """Output of a command as text that only differs when the state did.
+
+    `!` comment lines carry the configuration change time, they are left
+    out so that saving an unchanged configuration compares the same.
+    """
+    if isinstance(output, str):
+        return '\n'.join(row for row in output.split('\n') if not row.startswith('!'))
+    # The records of a stream input.
+    return repr(output)
+
+
+def state_digest(outputs, probe=None):
+    """Digest of everything a scan collected but the `probe` command, in any order."""
+    digest = hashlib.sha256()
+    for command in sorted(outputs):
+        if command == probe:
+            continue
+        digest.update(command.encode() + b'\0' + comparable(outputs[command]).encode() + b'\0')
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """Check results and findings of the last scan of every device, kept in SQLite.
+
+    Next to the results, each device keeps the answer to its change probe
+    (see change_probe: the configuration changes logged by the switch, not
+    the running-config IOS would build again to answer) and a digest of
+    the collected state. While the probe answers the same, a scan can reuse
+    the stored results instead of collecting everything again. Devices
+    whose probe answers nothing or an error, e.g. without a logging buffer,
+    are always scanned in full, and entries older than `max_age` seconds
+    are not reused, so state living outside the configuration (ports going
+    up or down, CDP neighbours) is still refreshed regularly. `evict` drops
+    the expired entries and keeps the `max_devices` most recently scanned
+    ones.
+    """
+
+    def __init__(self, path, max_age=MAX_AGE, max_devices=MAX_DEVICES):
+        self.max_age = max_age
+        self.max_devices = max_devices
+        self.lock = threading.Lock()
+        # Only imported by the runs keeping a cache.
+        import sqlite3
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        with self.db:
+            self.db.execute('CREATE TABLE IF NOT EXISTS results ('
+                            'device TEXT PRIMARY KEY, probe TEXT, digest TEXT, '
+                            'checks TEXT, scanned REAL, findings TEXT)')
+            columns = [row[1] for row in self.db.execute('PRAGMA table_info(results)')]
+            if 'findings' not in columns:
+                # Caches written before findings were kept.
+                self.db.execute('ALTER TABLE results ADD COLUMN findings TEXT')
+
+    def probe(self, scan, device):
+        return run_probe(scan, change_probe(device, scan.input('version')))
+
+    def lookup(self, device, probe, checks):
+        """Stored results and findings of `checks` if the device did not change, else None."""
+        if not probe:
+            return None
+        with self.lock:
+            row = self.db.execute('SELECT probe, checks, scanned, findings FROM results '
+                                  'WHERE device = ?', (device_key(device),)).fetchone()
+        if row is None or row[0] != probe or time.time() - row[2] > self.max_age or \
+           row[3] is None:
+            return None
+        results = json.loads(row[1])
+        if any(name not in results for name in checks):
+            return None
+        return {name: results[name] for name in checks}, \
+            [finding for finding in json.loads(row[3]) if finding["check"] in checks]
+
+    def digest(self, device):
+        with self.lock:
+            row = self.db.execute('SELECT digest FROM results WHERE device = ?',
+                                  (device_key(device),)).fetchone()
+        return row and row[0]
+
+    def store(self, device, probe, digest, checks, findings):
+        with self.lock, self.db:
+            self.db.execute('INSERT OR REPLACE INTO results (device, probe, digest, checks, '
+                            'scanned, findings) VALUES (?, ?, ?, ?, ?, ?)',
+                            (device_key(device), probe, digest, json.dumps(checks),
+                             time.time(), json.dumps(findings)))
+
+    def evict(self):
+        with self.lock, self.db:
+            self.db.execute('DELETE FROM results WHERE scanned < ?',
+                            (time.time() - self.max_age,))
+            self.db.execute('DELETE FROM results WHERE device NOT IN (SELECT device FROM '
+                            'results ORDER BY scanned DESC LIMIT ?)', (self.max_devices,))
+
+    def close(self):
+        self.evict()
+        self.db.close()
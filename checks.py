@@ -0,0 +1,418 @@
+#!/usr/bin/env python3.8
+
+import regex as re
+
+import parsers
+from facts import Facts, parse_version
+from interface_table import InterfaceTable, configured_violations, parse_cdp, \
+    parse_port_security
+from rules import Message, rule, source
+from running_config import RunningConfig
+from session import command_output
+
+RE_NATIVE_VLAN = re.compile(r'([1]) +([a-zA-Z-/]+) +')
+RE_VTP_MODE = re.compile(r"VTP Operating Mode +: (.*)")
+RE_STP_FLAGS = re.compile(r"^(.*?) +is (enabled|disabled)", re.MULTILINE)
+
+
+# Inputs: the commands a scan sends and how their output is parsed.
+
+@source('running_config', 'show running-config', timeout=5)
+def parse_running_config(response):
+    return RunningConfig(command_output(response))
+
+
+source('interfaces', 'show interfaces status', stream=True)(parsers.interfaces)
+source('port_security', 'show port-security', timeout=2)(parse_port_security)
+source('cdp', 'show cdp interface', timeout=2)(parse_cdp)
+source('vlans', 'show vlan brief', stream=True)(parsers.vlans)
+source('ip_interfaces', 'show ip interface brief', stream=True)(parsers.ip_interfaces)
+source('errdisable', 'show errdisable detect', stream=True)(parsers.errdisable)
+source('igmp_snooping_table', 'show ip igmp snooping', stream=True)(parsers.igmp_snooping)
+
+
+source('version', 'show version')(parse_version)
+
+
+@source('facts', needs=('version', 'interfaces', 'vlans'))
+def parse_facts(version, interfaces, vlans):
+    return Facts(version.model, version.ios, version.serial, tuple(interfaces), tuple(vlans))
+
+
+@source('interface_table', needs=('interfaces', 'port_security', 'cdp', 'running_config'))
+def parse_interface_table(interfaces, port_security, cdp, running_config):
+    return InterfaceTable(interfaces, port_security, cdp,
+                          configured_violations(running_config))
+
+
+@source('vlan', 'show vlan')
+def parse_vlan(response):
+    return RE_NATIVE_VLAN.search(response).groups()
+
+
+@source('access_lists', 'show access-lists')
+def parse_access_lists(response):
+    return command_output(response)
+
+
+@source('vtp_mode', 'show vtp status', timeout=2)
+def parse_vtp_mode(response):
+    return RE_VTP_MODE.search(response).groups()[0].strip()
+
+
+@source('vtp_password', 'show vtp password')
+def parse_vtp_password(response):
+    return ':' in command_output(response)
+
+
+@source('dtp', 'show dtp')
+def parse_dtp(response):
+    return response.split('\n')[-2][1:-1]
+
+
+@source('dot1x', 'show dot1x | include Sysauthcontrol')
+def parse_dot1x(response):
+    return command_output(response)
+
+
+@source('stp_summary', 'show spanning-tree summary totals')
+def parse_stp_summary(response):
+    return dict(RE_STP_FLAGS.findall(response.replace('\r', '')))
+
+
+@source('igmp_snooping', needs=('vlans', 'igmp_snooping_table'))
+def parse_igmp_snooping(vlans, igmp_snooping_table, run):
+    # VLAN -> True when snooping is disabled on it
+    table = {record.vlan: record.enabled for record in igmp_snooping_table}
+    for vlan in vlans:
+        if vlan.number not in table:
+            # Only asked for on its own when the bulk output left it out.
+            table.update(parsers.igmp_snooping(
+                run('show ip igmp snooping vlan {}'.format(vlan.number)).split('\n')))
+    return {vlan.number: not table.get(vlan.number, True) for vlan in vlans}
+
+
+@source('privilege', 'show privilege')
+def parse_privilege(response):
+    return response.split('\n')[1][:-1]
+
+
+# Rules: what is wrong with the collected state.
+
+@rule('warning', 'vlan', remediation="Switch(config)#default vlan ANY-NUMBER-BUT-NOT-1")
+def native_vlan(vlan):
+    if vlan[1] == "default":
+        yield Message("The native vlan should not be vlan 1. \
+Move the user trafic to a different vlan. The native VLAN is used for a lot \
+of management data such as DTP, VTP and CDP frames and also BPDU's for \
+spanning tree. Try changing the native vlan to a different created vlan. Eg. \
+command: Switch(config)#default vlan ANY-NUMBER-BUT-NOT-1", vlans=[vlan[0]])
+
+
+@rule('error', 'interface_table', remediation="Switch(config-if)#switchport port-security")
+def switchport_port_security(interface_table):
+    no_port_security_interfaces = ""
+    for interface in interface_table.connected():
+        if interface not in interface_table.port_security:
+            no_port_security_interfaces += interface + " "
+    if no_port_security_interfaces:
+        yield Message("Port Security is not enabled for interfaces: {}.\
+This missconfiguration could lead to different vulnerabilites like:\
+MITM, CAM overflow. You should enable the port-security on \
+all access ports. Eg. command: Switch(config-if)#switchport \
+port-security".format(no_port_security_interfaces),
+                      interfaces=no_port_security_interfaces.split())
+
+
+@rule('error', 'interface_table',
+      remediation="Switch(config-if)#switchport port-security violation restrict")
+def switchport_port_security_violation(interface_table):
+    no_port_security_violation_interfaces = ""
+    for interface in interface_table.connected():
+        if interface_table.violation_mode(interface) not in ("Restrict", "Shutdown"):
+            no_port_security_violation_interfaces += interface + " "
+    if no_port_security_violation_interfaces:
+        yield Message("Port Security Violation Mode is not enabled for interfaces: {}.\
+This missconfiguration could lead to different vulnerabilites like:\
+MITM, CAM overflow. You should enable the port-security on \
+all access ports. Eg. command: Switch(config-if)#switchport \
+port-security".format(no_port_security_violation_interfaces),
+                      interfaces=no_port_security_violation_interfaces.split())
+
+
+@rule('error', 'interface_table', remediation="Switch(config)#no cdp run")
+def cdp(interface_table):
+    # sa fie disabled (cmd: no cdp run) pt ca mesajele cdp sunt
+    # neencriptate/neautentificate
+    cdp_interfaces = ""
+    for interface in interface_table.connected():
+        if interface_table.cdp.get(interface) == "up":
+            cdp_interfaces += interface + " "
+    if cdp_interfaces:
+        yield Message("CDP is enabled for interfaces: {}.\
+This missconfiguration could lead to information disclosure because \
+messages are sent unencrypted and unauthenticated. You should disable the cdp on \
+all ports. Eg. command: Switch(config)#no cdp run".format(cdp_interfaces),
+                      interfaces=cdp_interfaces.split())
+
+
+@rule('warning', 'access_lists')
+def acl(access_lists):
+    # acl-ul sa nu aiba vreun 'deny all' in ale sale reguli
+    if "deny   any" in access_lists:
+        yield "There is a 'deny all' statement in your access \
+list. This statement is by default at the end of all access lists. You \
+could delete this statement and review your access lists."
+
+
+@rule('warning', 'running_config')
+def console_password(running_config):
+    # de preferat sa existe parola pe consola
+    login = False
+    password = False
+    password_encrypted = False
+    for e in running_config.block('line con 0'):
+        if 'login' in e:
+            login = True
+        elif 'password' in e:
+            password = True
+            if len(e.split(" ")) > 2:
+                password_encrypted = True
+
+    if not login:
+        yield Message("You forgot to enable your login on your \
+console connection. Without this everybody will be able to connect \
+without a password. Enable command: Switch(config-line)#login",
+                      remediation="Switch(config-line)#login")
+    if not password:
+        yield Message("You forgot to set a pass on your \
+console connection. Without this password everybody will be able to connect \
+to your switch. Command: Switch(config-line)#password something",
+                      remediation="Switch(config-line)#password something")
+    elif not password_encrypted:
+        yield Message("You forgot to encrypt your password for \
+console connection. Without this the password is stored unencrypted in your \
+config file. Command: Switch(config)#service password-encryption",
+                      remediation="Switch(config)#service password-encryption")
+
+
+@rule('warning', 'running_config')
+def enable_password(running_config):
+    # de preferat sa existe parola pe enable
+    password = running_config.include('enable password')
+    if not password:
+        yield Message("You forgot to use a password for switch configuration. \
+Without this everybody can config the switch without a password. Command:\
+Switch(config)#enable password something",
+                      remediation="Switch(config)#enable password something")
+    else:
+        password = password[0].split(" ")
+        if len(password) < 4:
+            yield Message("You forgot to encrypt your password for \
+switch configuration. Without this the password is stored unencrypted in your \
+config file. Command: Switch(config)#service password-encryption",
+                          remediation="Switch(config)#service password-encryption")
+
+
+@rule('error', 'vtp_mode', 'vtp_password', remediation="Switch(config)#vtp password PASSWORD")
+def vtp_password(vtp_mode, vtp_password):
+    # de preferat sa aiba o parola (sh vtp status)
+    if vtp_mode != 'Transparent' and not vtp_password:
+        yield "VTP is runnig without a password. \
+This missconfiguration could lead to a DoS through VTP spoofing. \
+If you want to use this protocol you should use it with a strong password. \
+Eg. command: Switch(config)#vtp password ^FV'(Oq2_ ."
+
+
+@rule('warning', 'running_config', remediation="Switch(config-line)#transport input ssh")
+def telnet(running_config):
+    # sa fie disabled, sa se limiteze accesul liniilor vty
+    # sa se foloseasca servere RADIUS pentru AAA
+    if running_config.include('telnet'):
+        yield "Telnet is enabled. You should use \
+ssh otherwise your trafic will be unencrypted."
+
+
+@rule('error', 'dtp', remediation="Switch(config-if)#switchport nonegotiate")
+def dtp(dtp):
+    # disabled dtp pentru a nu se forta un trunk intre switch si atacator
+    if not dtp.startswith('0'):
+        yield "DTP is runnig on {} port(s). You \
+should disable DTP on all runnig ports so any attacker \
+could not force a trunk between him and switch.".format(dtp.split(" ")[0])
+
+
+@rule('error', 'running_config', remediation="Switch(config)#ip dhcp snooping")
+def dhcp(running_config):
+    # DHCP snooping
+    if not running_config.include('ip dhcp snooping'):
+        yield "DHCP is not runnig in snooping mode. This \
+could lead to vulnerabilites like DHCP starving or DHCP rogue. Enable the DHCP snooping.\
+Command: Switch(config-if)#ip dhcp snooping trust/limit"
+
+
+@rule('warning', 'running_config', remediation="Switch(config)#no service tcp-small-servers")
+def tcp_small_servers(running_config):
+    # disable (no service tcp-small-servers)
+    if running_config.include('service tcp-small-servers'):
+        yield "Tcp-small-servers service is runnig. This is used for switch \
+diagnostics. You can disable: Switch(config)#no service tcp-small-servers"
+
+
+@rule('warning', 'running_config', remediation="Switch(config)#no service udp-small-servers")
+def udp_small_servers(running_config):
+    # disable (no service udp-small-servers)
+    if running_config.include('service udp-small-servers'):
+        yield "Udp-small-servers service is runnig.This is used for switch \
+diagnostics. You can disable: Switch(config)#no service udp-small-servers"
+
+
+@rule('warning', 'running_config', remediation="Switch(config)#no service finger")
+def service_finger(running_config):
+    # disable (no service finger)
+    if running_config.include('finger'):
+        yield "Finger service is runnig."
+
+
+@rule('warning', 'ip_interfaces')
+def all_ports_are_healthy(ip_interfaces):
+    for interface in ip_interfaces:
+        if interface.ok != "YES":
+            yield Message("{} is not ok.".format(interface.name), interfaces=[interface.name])
+
+
+@rule('error', 'dot1x', name='802_1x', remediation="Switch(config)#dot1x system-auth-control")
+def dot1x_auth(dot1x):
+    # sysauthcontrol should be Enabled
+    if "Disabled" in dot1x:
+        yield "802.1X authentication mechanism is not enabled. \
+Now devices could attach to LANs and WLANs. Enable command: Switch(config-if)#dot1x \
+reauthentication"
+
+
+@rule('error', 'stp_summary',
+      remediation="Switch(config-if)#spanning-tree bpduguard enable")
+def stp_bpduguard(stp_summary):
+    if any(state == "disabled" for flag, state in stp_summary.items() if "BPDU Guard" in flag):
+        yield "BPDU guard is disabled. This could lead to STP attacks. Enable \
+command: Switch(config-if)#spanning-tree bpduguard enable"
+
+
+@rule('warning', 'running_config', remediation="Switch(config-if)#spanning-tree guard root")
+def stp_root_guard(running_config):
+    if not running_config.include('spanning-tree guard root'):
+        yield "STP guard root is not enabled on your switch. Enable command: \
+Switch(config-if)#spanning-tree guard root"
+
+
+@rule('error', 'stp_summary', remediation="Switch(config-if)#spanning-tree guard loop")
+def stp_loopguard(stp_summary):
+    if any(state == "disabled" for flag, state in stp_summary.items()
+           if "Loopguard Default" in flag):
+        yield "LOOP guard is disabled. This could lead to STP attacks. Enable command: \
+Switch(config-if)#spanning-tree guard loop"
+
+
+@rule('error', 'igmp_snooping')
+def igmp_snooping(igmp_snooping):
+    for vlan, disabled in igmp_snooping.items():
+        if disabled:
+            yield Message("IGMP snooping is not enabled for VLAN \
+{}. This could lead to DoS attacks. Enable command: Switch(config)#ip igmp snooping \
+vlan {}.".format(vlan, vlan), vlans=[vlan],
+                          remediation="Switch(config)#ip igmp snooping vlan {}".format(vlan))
+
+
+@rule('warning', 'running_config', remediation="Switch(config)#aaa new-model")
+def aaa(running_config):
+    if not running_config.include('aaa'):
+        yield "AAA protocol is not enabled on your switch. Enable command: \
+Switch(config)#aaa new-model"
+
+
+@rule('warning', 'errdisable')
+def errdisable(errdisable):
+    for cause in errdisable:
+        if cause.detection == 'Disabled':
+            yield Message("{} has errdisable detection disabled".format(cause.cause),
+                          remediation="Switch(config)#errdisable detect cause {}".format(
+                              cause.cause))
+
+
+# Catalyst 3650, 3850 and 9000 switches run IOS XE, which has no VMPS client.
+@rule('warning', 'running_config', unsupported=('C9', 'WS-C3650', 'WS-C3850'))
+def vmps(running_config):
+    response = running_config.include('vmps server')
+    if not response:
+        yield "VMPS is not enabled."
+    else:
+        yield "info", "Switch has VMPS enabled to ip: " + response[0].split(" ")[2]
+
+
+@rule('warning', 'running_config')
+def tacacs_server(running_config):
+    host = False
+    key = False
+    for e in running_config.include('tacacs-server'):
+        if "host" in e:
+            host = True
+            yield "info", "Tacacs Server is: " + e.split(" ")[-1]
+        elif "key" in e:
+            key = True
+    if not host:
+        yield Message("Switch is running without a tacacs server",
+                      remediation="Switch(config)#tacacs-server host ADDRESS")
+    elif not key:
+        yield Message("Switch is connecting to a tacacs server without \
+any authentication key.", remediation="Switch(config)#tacacs-server key KEY")
+
+
+@rule('info', 'running_config')
+def banner_login(running_config):
+    if running_config.banners.get('login'):
+        yield "Banner login: " + running_config.banners['login']
+
+
+@rule('info', 'running_config')
+def hostname(running_config):
+    response = running_config.include('hostname')
+    if response:
+        yield "Switch hostname: " + response[0].split(" ")[1]
+
+
+@rule('info', 'running_config')
+def banner_motd(running_config):
+    if running_config.banners.get('motd'):
+        yield "Banner motd: " + running_config.banners['motd']
+
+
+@rule('info', 'ip_interfaces')
+def return_ips(ip_interfaces):
+    assigned = [interface for interface in ip_interfaces if interface.address != "unassigned"]
+    if assigned:
+        yield Message("Interfaces IPs:\n" + "\n".join(
+            "{}: {}".format(interface.name, interface.address) for interface in assigned),
+            interfaces=[interface.name for interface in assigned])
+
+
+@rule('info', 'vlans')
+def return_active_vlans(vlans):
+    if vlans:
+        yield Message("Active Vlans and their names:\n" + "\n".join(
+            "VLAN{} <-> {}".format(vlan.number, vlan.name) for vlan in vlans),
+            vlans=[vlan.number for vlan in vlans])
+
+
+@rule('info', 'privilege')
+def privilege(privilege):
+    yield privilege
+
+
+@rule('warning', 'running_config')
+def default_gateway(running_config):
+    response = running_config.include('ip default-gateway')
+    if not response:
+        yield "info", "Switch is not accessible from the internet"
+    else:
+        yield "Switch is accessible from the internet through the \
+ip: " + response[0].split(" ")[2]
@@ -0,0 +1,580 @@
+#!/usr/bin/env python3.8
+
+import argparse
+import socket
+import socketserver
+import threading
+import time
+from collections import Counter
+
+PAGE_LENGTH = 24
+PORTS_PER_MEMBER = 48
+MORE = b" --More-- "
+ERASE_MORE = b"\b" * 9 + b" " * 9 + b"\b" * 9
+INVALID = "                 ^\n% Invalid input detected at '^' marker.\n"
+
+
+class Device:
+    """Canned IOS state of an emulated Catalyst switch.
+
+    Ports are numbered like a stack of 48 port members (Gi1/0/1 ... Gi2/0/48)
+    and every VLAN gets an SVI-less `vlan N` block. The state is built so
+    that every check of app.py has something to find: some ports lack
+    port-security, CDP is left on and the STP guards are disabled.
+    """
+
+    def __init__(self, hostname="Switch", ports=24, vlans=10):
+        self.hostname = hostname
+        self.vlans = [1] + [10 * number for number in range(1, vlans)]
+        self.interfaces = []
+        for index in range(ports):
+            member, number = divmod(index, PORTS_PER_MEMBER)
+            self.interfaces.append({
+                "name": "Gi{}/0/{}".format(member + 1, number + 1),
+                "long": "GigabitEthernet{}/0/{}".format(member + 1, number + 1),
+                "status": "notconnect" if index % 4 == 3 else "connected",
+                "vlan": self.vlans[index % len(self.vlans)],
+                "port_security": index % 3 != 2,
+                "violation": "Protect" if index % 7 == 6 else "Shutdown",
+            })
+        self.igmp_disabled = set(self.vlans[5::10])
+        self.cpu = 5
+        self.changed = time.strftime("%H:%M:%S UTC %a %b %d %Y", time.gmtime())
+        self._config = None
+
+    def running_config(self):
+        if self._config is None:
+            rows = ["Building configuration...", "",
+                    "Current configuration : 0 bytes", "!",
+                    "! Last configuration change at " + self.changed, "!", "version 15.2",
+                    "service password-encryption", "!", "hostname " + self.hostname,
+                    "!", "enable secret 5 $1$mERr$hx5rVt7rPNoS4wqbXKX7m0", "!",
+                    "aaa new-model", "!", "ip dhcp snooping vlan 10",
+                    "ip dhcp snooping", "!", "spanning-tree mode rapid-pvst", "!"]
+            for vlan in self.vlans[1:]:
+                rows += ["vlan {}".format(vlan), " name VLAN{:04d}".format(vlan), "!"]
+            for interface in self.interfaces:
+                rows += ["interface " + interface["long"],
+                         " switchport access vlan {}".format(interface["vlan"]),
+                         " switchport mode access"]
+                if interface["port_security"]:
+                    rows.append(" switchport port-security")
+                if interface["violation"] != "Shutdown":
+                    rows.append(" switchport port-security violation " +
+                                interface["violation"].lower())
+                rows.append("!")
+            rows += ["interface Vlan1", " ip address 10.0.0.2 255.255.255.0", "!",
+                     "ip default-gateway 10.0.0.1", "!",
+                     "tacacs-server host 10.0.0.9", "tacacs-server key 7 0822455D0A16",
+                     "!", "banner motd ^CAuthorized access only^C", "!",
+                     "line con 0", " password 7 0822455D0A16", " login",
+                     "line vty 0 4", " password 7 0822455D0A16",
+                     " transport input ssh telnet", "!", "end", ""]
+            config = "\n".join(rows)
+            self._config = config.replace("Current configuration : 0 bytes",
+                                          "Current configuration : {} bytes".format(len(config)))
+        return self._config
+
+    def output(self, command):
+        """Output of a command, or None when IOS would reject it."""
+        command, _, pipe = command.partition("|")
+        words = command.split()
+        if not words:
+            return ""
+        text = self._show(" ".join(words))
+        if text is None or not pipe:
+            return text
+        kind, _, pattern = pipe.strip().partition(" ")
+        rows = text.split("\n")
+        if kind in ("include", "i"):
+            rows = [row for row in rows if pattern in row]
+        elif kind in ("exclude", "e"):
+            rows = [row for row in rows if pattern not in row]
+        elif kind in ("begin", "b"):
+            start = next((index for index, row in enumerate(rows) if pattern in row), len(rows))
+            rows = rows[start:]
+        else:
+            return None
+        text = "\n".join(row for row in rows if row) + "\n" if any(rows) else ""
+        # IOS starts the filtered running-config with an empty line.
+        return "\n" + text if words[1:2] == ["running-config"] else text
+
+    def _show(self, command):
+        ports = self.interfaces
+        if command == "show running-config":
+            return self.running_config()
+        if command == "show version":
+            return VERSION.format(hostname=self.hostname, ports=len(ports))
+        if command == "show privilege":
+            return "Current privilege level is 15\n"
+        if command == "show interfaces status":
+            return "Port      Name               Status       Vlan       Duplex  Speed Type\n" + \
+                "".join("{:<9} {:<18} {:<12} {:<10} {:<7} {:<5} 10/100/1000BaseTX\n".format(
+                    port["name"], "", port["status"], port["vlan"],
+                    "a-full" if port["status"] == "connected" else "auto",
+                    "a-1000" if port["status"] == "connected" else "auto") for port in ports)
+        if command == "show port-security":
+            return "Secure Port  MaxSecureAddr  CurrentAddr  SecurityViolation  Security Action\n" \
+                "                (Count)       (Count)          (Count)\n" + "-" * 75 + "\n" + \
+                "".join("{:>11}{:>15}{:>13}{:>19}{:>17}\n".format(
+                    port["name"], 1, 1 if port["status"] == "connected" else 0, 0,
+                    port["violation"]) for port in ports if port["port_security"]) + \
+                "-" * 75 + "\nTotal Addresses in System (excluding one mac per port)     : 0\n" \
+                "Max Addresses limit in System (excluding one mac per port) : 4096\n"
+        if command.startswith("show port-security interface "):
+            port = self._port(command.split()[-1])
+            if port is None:
+                return None
+            return PORT_SECURITY.format(
+                "Enabled" if port["port_security"] else "Disabled",
+                "Secure-up" if port["port_security"] else "Secure-down", port["violation"])
+        if command == "show cdp interface":
+            return "".join(CDP.format(port["long"], self._up(port)) for port in ports) + \
+                " cdp enabled interfaces : {}\n".format(len(ports))
+        if command.startswith("show cdp interface "):
+            port = self._port(command.split()[-1])
+            return None if port is None else CDP.format(port["long"], self._up(port))
+        if command in ("show vlan", "show vlan brief"):
+            text = "\nVLAN Name                             Status    Ports\n" \
+                "---- -------------------------------- --------- -------------------------------\n"
+            for vlan in self.vlans:
+                members = [port["name"] for port in ports if port["vlan"] == vlan]
+                lines = [", ".join(members[start:start + 6])
+                         for start in range(0, len(members), 6)] or [""]
+                text += "{:<4} {:<32} active    {}\n".format(
+                    vlan, "default" if vlan == 1 else "VLAN{:04d}".format(vlan), lines[0])
+                text += "".join(" " * 48 + line + "\n" for line in lines[1:])
+            return text + "1002 fddi-default                     act/unsup \n" \
+                "1003 token-ring-default               act/unsup \n"
+        if command == "show access-lists":
+            return "Standard IP access list 10\n    10 permit 10.0.0.0, wildcard bits 0.0.0.255\n" \
+                "Extended IP access list 110\n    10 permit tcp any any eq 22\n" \
+                "    20 deny   any any log\n"
+        if command == "show vtp status":
+            return VTP_STATUS.format(vlans=len(self.vlans) + 4)
+        if command == "show vtp password":
+            return "The VTP password is not configured.\n"
+        if command == "show dtp":
+            return "Global DTP information\n\tSending DTP Hello packets every 30 seconds\n" \
+                "\tDynamic Trunk timeout is 300 seconds\n\t{} interfaces using DTP\n".format(
+                    len(ports) // 8)
+        if command == "show ip interface brief":
+            return "Interface              IP-Address      OK? Method Status                Protocol\n" \
+                "Vlan1                  10.0.0.2        YES NVRAM  up                    up      \n" + \
+                "".join("{:<22} unassigned      YES unset  {:<21} {:<8}\n".format(
+                    port["long"], self._up(port), self._up(port)) for port in ports)
+        if command == "show dot1x":
+            return "Sysauthcontrol              Disabled\nDot1x Protocol Version            3\n"
+        if command == "show spanning-tree summary totals":
+            return SPANNING_TREE.format(vlans=len(self.vlans))
+        if command == "show ip igmp snooping":
+            return IGMP_GLOBAL + "".join(self._igmp(vlan) for vlan in self.vlans)
+        if command.startswith("show ip igmp snooping vlan "):
+            vlan = command.split()[-1]
+            if not vlan.isdigit() or int(vlan) not in self.vlans:
+                return "% Vlan {} does not exist\n".format(vlan)
+            return IGMP_GLOBAL + self._igmp(int(vlan))
+        if command == "show errdisable detect":
+            return ERRDISABLE
+        if command == "show logging":
+            return "Syslog logging: enabled\n\nLog Buffer (4096 bytes):\n\n" \
+                "{0}: %LINEPROTO-5-UPDOWN: Line protocol on Interface Vlan1, " \
+                "changed state to up\n{0}: %SYS-5-CONFIG_I: Configured from console " \
+                "by admin on vty0 (10.0.0.1)\n".format(self.changed)
+        if command == "show processes cpu":
+            return "CPU utilization for five seconds: {0}%/0%; one minute: {0}%; " \
+                "five minutes: {0}%\n PID Runtime(ms)     Invoked      uSecs   5Sec   1Min   " \
+                "5Min TTY Process \n".format(self.cpu)
+        return None
+
+    def _port(self, name):
+        return next((port for port in self.interfaces
+                     if name in (port["name"], port["long"])), None)
+
+    @staticmethod
+    def _up(port):
+        return "up" if port["status"] == "connected" else "down"
+
+    def _igmp(self, vlan):
+        return "\nVlan {}:\n--------\nIGMP snooping                       : {}\n" \
+            "IGMPv2 immediate leave              : Disabled\n" \
+            "Multicast router learning mode      : pim-dvmrp\n".format(
+                vlan, "Disabled" if vlan in self.igmp_disabled else "Enabled")
+
+
+class Stats:
+    """Traffic seen by the emulator, summed over every connection."""
+
+    def __init__(self):
+        self.counters = Counter()
+        self.lock = threading.Lock()
+
+    def add(self, **counts):
+        with self.lock:
+            self.counters.update(counts)
+
+    def snapshot(self):
+        with self.lock:
+            return Counter(self.counters)
+
+
+class Terminal:
+    """CLI byte stream of one client, over a socket or an SSH channel."""
+
+    def __init__(self, stream, stats):
+        self.stream = stream
+        self.stats = stats
+        self.pending = b""
+
+    def _fill(self):
+        data = self.stream.recv(4096)
+        if not data:
+            raise EOFError
+        self.stats.add(bytes_in=len(data))
+        self.pending += data
+
+    def key(self):
+        while not self.pending:
+            self._fill()
+        key, self.pending = self.pending[:1], self.pending[1:]
+        return key
+
+    def line(self):
+        """Next command line; Ctrl-Z and Ctrl-C come back on their own."""
+        while True:
+            for index, byte in enumerate(self.pending):
+                if byte in (0x1a, 0x03, 0x0a):
+                    line, self.pending = self.pending[:index], self.pending[index + 1:]
+                    if byte != 0x0a:
+                        return chr(byte)
+                    return line.replace(b"\r", b"").decode("ascii", "replace")
+            self._fill()
+
+    def send(self, text):
+        data = text if isinstance(text, bytes) else text.replace("\n", "\r\n").encode()
+        self.stats.add(bytes_out=len(data))
+        self.stream.sendall(data)
+
+
+class Emulator:
+    """Telnet (and SSH) server answering like an IOS switch."""
+
+    def __init__(self, device=None, latency=0.0, paging=True, password=None,
+                 enable_password=None):
+        self.device = device or Device()
+        self.latency = latency
+        self.paging = paging
+        self.password = password
+        self.enable_password = enable_password
+        self.stats = Stats()
+        self.servers = []
+
+    def cli(self, terminal, login=True):
+        device = self.device
+        self.stats.add(logins=1)
+        if login:
+            terminal.send("\nUser Access Verification\n\nPassword: ")
+            if not self._password(terminal, self.password):
+                return
+        mode = ">"
+        length = PAGE_LENGTH if self.paging else 0
+        terminal.send("\n" + device.hostname + mode)
+        while True:
+            line = terminal.line()
+            self.stats.add(commands=1)
+            if line in ("\x1a", "\x03"):
+                terminal.send("\n" + device.hostname + mode)
+                continue
+            terminal.send(line + "\n")
+            command = line.strip()
+            time.sleep(self.latency)
+            if command in ("exit", "quit", "logout"):
+                return
+            if command in ("enable", "en"):
+                terminal.send("Password: ")
+                if self._password(terminal, self.enable_password):
+                    mode = "#"
+                else:
+                    terminal.send("% Access denied\n")
+                terminal.send("\n" + device.hostname + mode)
+                continue
+            if command.startswith("terminal length"):
+                length = int(command.split()[-1])
+                text = ""
+            elif command in ("", "end"):
+                text = ""
+            else:
+                text = device.output(command)
+                if text is None:
+                    text = INVALID
+            self._page(terminal, text, length)
+            terminal.send(device.hostname + mode)
+
+    def _password(self, terminal, expected):
+        password = terminal.line()
+        terminal.send("\n")
+        return expected is None or password == expected
+
+    def _page(self, terminal, text, length):
+        rows = text.split("\n")
+        if not length or len(rows) <= length:
+            terminal.send(text)
+            return
+        for start in range(0, len(rows), length - 1):
+            page = "\n".join(rows[start:start + length - 1])
+            if start + length - 1 >= len(rows):
+                terminal.send(page)
+                return
+            terminal.send((page + "\n").replace("\n", "\r\n").encode() + MORE)
+            self.stats.add(pages=1)
+            key = terminal.key()
+            terminal.send(ERASE_MORE)
+            if key in (b"q", b"Q"):
+                terminal.send("\n")
+                return
+
+    def serve_telnet(self, host="127.0.0.1", port=0):
+        emulator = self
+
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                try:
+                    emulator.cli(Terminal(self.request, emulator.stats))
+                except (EOFError, OSError):
+                    pass
+
+        return self._start(_Server((host, port), Handler))
+
+    def serve_ssh(self, host="127.0.0.1", port=0, username=None):
+        import paramiko
+        emulator = self
+        host_key = paramiko.RSAKey.generate(2048)
+
+        class Interface(paramiko.ServerInterface):
+            def __init__(self):
+                # channel id -> [started, exec command or None for a shell]
+                self.requests = {}
+
+            def _request(self, channel, command=None):
+                self.requests[channel.get_id()][1] = command
+                self.requests[channel.get_id()][0].set()
+                return True
+
+            def check_auth_password(self, user, password):
+                if username not in (None, user) or emulator.password not in (None, password):
+                    return paramiko.AUTH_FAILED
+                return paramiko.AUTH_SUCCESSFUL
+
+            def get_allowed_auths(self, user):
+                return "password"
+
+            def check_channel_request(self, kind, chanid):
+                self.requests[chanid] = [threading.Event(), None]
+                return paramiko.OPEN_SUCCEEDED
+
+            def check_channel_pty_request(self, *args):
+                return True
+
+            def check_channel_shell_request(self, channel):
+                return self._request(channel)
+
+            def check_channel_exec_request(self, channel, command):
+                return self._request(channel, command.decode())
+
+        def serve(channel, interface):
+            # Every channel of a connection is a session of its own, like a vty.
+            started, _ = interface.requests[channel.get_id()]
+            try:
+                if not started.wait(30):
+                    return
+                command = interface.requests[channel.get_id()][1]
+                terminal = Terminal(channel, emulator.stats)
+                if command is None:
+                    emulator.cli(terminal, login=False)
+                else:
+                    emulator.stats.add(logins=1, commands=1)
+                    time.sleep(emulator.latency)
+                    terminal.send(emulator.device.output(command) or INVALID)
+            except (EOFError, OSError, paramiko.SSHException):
+                pass
+            finally:
+                channel.close()
+
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                transport = paramiko.Transport(self.request)
+                transport.add_server_key(host_key)
+                interface = Interface()
+                threads = []
+                try:
+                    transport.start_server(server=interface)
+                    while transport.is_active():
+                        channel = transport.accept(1)
+                        if channel is not None:
+                            threads.append(threading.Thread(target=serve,
+                                                            args=(channel, interface)))
+                            threads[-1].start()
+                        elif threads and not any(thread.is_alive() for thread in threads):
+                            break
+                except (EOFError, OSError, paramiko.SSHException):
+                    pass
+                finally:
+                    transport.close()
+
+        return self._start(_Server((host, port), Handler))
+
+    def _start(self, server):
+        self.servers.append(server)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server.server_address
+
+    def stop(self):
+        for server in self.servers:
+            server.shutdown()
+            server.server_close()
+        self.servers = []
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+    request_queue_size = 128
+
+
+VERSION = """Cisco IOS Software, C2960X Software (C2960X-UNIVERSALK9-M), Version 15.2(7)E4, RELEASE SOFTWARE (fc2)
+Technical Support: http://www.cisco.com/techsupport
+Copyright (c) 1986-2021 by Cisco Systems, Inc.
+Compiled Tue 23-Mar-21 04:19 by prod_rel_team
+
+ROM: Bootstrap program is C2960X boot loader
+BOOTLDR: C2960X Boot Loader (C2960X-HBOOT-M) Version 15.2(7r)E, RELEASE SOFTWARE (fc1)
+
+{hostname} uptime is 3 weeks, 2 days, 4 hours, 12 minutes
+System returned to ROM by power-on
+System image file is "flash:c2960x-universalk9-mz.152-7.E4.bin"
+
+cisco WS-C2960X-48FPD-L (APM86XXX) processor (revision B0) with 524288K bytes of memory.
+Processor board ID FOC1234X0AB
+{ports} Gigabit Ethernet interfaces
+The password-recovery mechanism is enabled.
+
+Model number                    : WS-C2960X-48FPD-L
+System serial number            : FOC1234X0AB
+"""
+
+PORT_SECURITY = """Port Security              : {}
+Port Status                : {}
+Violation Mode             : {}
+Aging Time                 : 0 mins
+Aging Type                 : Absolute
+SecureStatic Address Aging : Disabled
+Maximum MAC Addresses      : 1
+Total MAC Addresses        : 0
+"""
+
+CDP = """{0} is {1}, line protocol is {1}
+  Encapsulation ARPA
+  Sending CDP packets every 60 seconds
+  Holdtime is 180 seconds
+"""
+
+VTP_STATUS = """VTP Version capable             : 1 to 3
+VTP version running             : 1
+VTP Domain Name                 : CORP
+VTP Pruning Mode                : Disabled
+VTP Traps Generation            : Disabled
+Device ID                       : 0cd9.96a1.b200
+Configuration last modified by 0.0.0.0 at 3-1-93 00:02:11
+
+Feature VLAN:
+--------------
+VTP Operating Mode                : Server
+Maximum VLANs supported locally   : 255
+Number of existing VLANs          : {vlans}
+"""
+
+SPANNING_TREE = """Switch is in rapid-pvst mode
+Root bridge for: none
+Extended system ID                      is enabled
+Portfast Default                        is disabled
+Portfast BPDU Guard Default             is disabled
+Portfast BPDU Filter Default            is disabled
+Loopguard Default                       is disabled
+EtherChannel misconfig guard            is enabled
+UplinkFast                              is disabled
+BackboneFast                            is disabled
+Pathcost method used                    is short
+
+Name                   Blocking Listening Learning Forwarding STP Active
+---------------------- -------- --------- -------- ---------- ----------
+{vlans} vlans                       0         0        0          1          1
+"""
+
+IGMP_GLOBAL = """Global IGMP Snooping configuration:
+-------------------------------------------
+IGMP snooping                : Enabled
+IGMPv3 snooping (minimal)    : Enabled
+Report suppression           : Enabled
+TCN solicit query            : Disabled
+TCN flood query count        : 2
+Robustness variable          : 2
+Last member query count      : 2
+Last member query interval   : 1000
+"""
+
+ERRDISABLE = """ErrDisable Reason            Detection    Mode
+-----------------            ---------    ----
+arp-inspection               Enabled      port
+bpduguard                    Enabled      port
+channel-misconfig (STP)      Enabled      port
+dhcp-rate-limit              Enabled      port
+dtp-flap                     Enabled      port
+gbic-invalid                 Enabled      port
+inline-power                 Enabled      port
+link-flap                    Enabled      port
+loopback                     Enabled      port
+lsgroup                      Enabled      port
+pagp-flap                    Enabled      port
+port-mode-failure            Enabled      port
+psecure-violation            Enabled      port/vlan
+security-violation           Disabled     port
+sfp-config-mismatch          Enabled      port
+storm-control                Enabled      port
+udld                         Enabled      port
+vmps                         Enabled      port
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Emulate an IOS switch on this host.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--telnet-port", type=int, default=2323)
+    parser.add_argument("--ssh-port", type=int, help="also serve SSH on this port")
+    parser.add_argument("--hostname", default="Switch")
+    parser.add_argument("--ports", type=int, default=24, help="number of switch ports")
+    parser.add_argument("--vlans", type=int, default=10, help="number of VLANs")
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="seconds the switch waits before answering each command")
+    parser.add_argument("--no-paging", action="store_true",
+                        help="never stop long outputs at --More--")
+    parser.add_argument("--password", help="login password, anything is accepted if unset")
+    parser.add_argument("--enable-password", help="enable password, anything if unset")
+    options = parser.parse_args()
+
+    emulator = Emulator(Device(options.hostname, options.ports, options.vlans),
+                        latency=options.latency, paging=not options.no_paging,
+                        password=options.password, enable_password=options.enable_password)
+    print("Telnet on {}:{}".format(*emulator.serve_telnet(options.host, options.telnet_port)))
+    if options.ssh_port is not None:
+        print("SSH on {}:{}".format(*emulator.serve_ssh(options.host, options.ssh_port)))
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        emulator.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3.8
+
+import json
+import threading
+import time
+from collections import namedtuple
+
+import regex as re
+
+from cache import device_key
+from parsers import Interface, Vlan
+
+FACTS_TTL = 3600
+
+Version = namedtuple("Version", "model ios serial")
+# What a switch is and what it has, known before any check runs.
+Facts = namedtuple("Facts", "model ios serial interfaces vlans")
+
+RE_MODEL = re.compile(r"^Model [Nn]umber +: (\S+)|^cisco (\S+) .*processor", re.MULTILINE)
+RE_IOS = re.compile(r"Version ([^,\s]+)")
+RE_SERIAL = re.compile(r"^System [Ss]erial [Nn]umber +: (\S+)|^Processor board ID (\S+)",
+                       re.MULTILINE)
+
+
+def _first(regex, text):
+    match = regex.search(text)
+    return next((group for group in match.groups() if group), "") if match else ""
+
+
+def parse_version(response):
+    """`show version` -> Version(model, ios, serial), empty strings when not found"""
+    text = response.replace('\r', '')
+    return Version(_first(RE_MODEL, text), _first(RE_IOS, text), _first(RE_SERIAL, text))
+
+
+def known_inputs(session, facts=None):
+    """Inputs a scan of `session` can start from without sending anything.
+
+    Cached facts give the version, interfaces and VLANs; without them the
+    version comes from the `show version` the login already read.
+    """
+    if facts is not None:
+        return {'facts': facts, 'version': Version(facts.model, facts.ios, facts.serial),
+                'interfaces': list(facts.interfaces), 'vlans': list(facts.vlans)}
+    if getattr(session, 'version', None):
+        return {'version': parse_version(session.version)}
+    return {}
+
+
+class FactsCache:
+    """Facts of every device, kept in SQLite for `ttl` seconds.
+
+    Interfaces go up and down, so the facts are only reused for a while;
+    after `ttl` the next scan collects and stores them again. A recording
+    never starts from cached facts, so that its transcript holds every
+    command a replay sends, and a replay's old facts are not stored.
+    """
+
+    def __init__(self, path, ttl=FACTS_TTL):
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        # Only imported by the runs keeping a cache.
+        import sqlite3
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        with self.db:
+            self.db.execute('CREATE TABLE IF NOT EXISTS facts ('
+                            'device TEXT PRIMARY KEY, facts TEXT, collected REAL)')
+
+    def lookup(self, device):
+        if device.get("RECORD") or device.get("REPLAY"):
+            return None
+        with self.lock:
+            row = self.db.execute('SELECT facts, collected FROM facts WHERE device = ?',
+                                  (device_key(device),)).fetchone()
+        if row is None or time.time() - row[1] > self.ttl:
+            return None
+        model, ios, serial, interfaces, vlans = json.loads(row[0])
+        return Facts(model, ios, serial, tuple(Interface(*row) for row in interfaces),
+                     tuple(Vlan(*row) for row in vlans))
+
+    def store(self, device, facts):
+        if device.get("REPLAY"):
+            return
+        with self.lock, self.db:
+            self.db.execute('INSERT OR REPLACE INTO facts VALUES (?, ?, ?)',
+                            (device_key(device), json.dumps(facts, separators=(',', ':')),
+                             time.time()))
+
+    def close(self):
+        with self.lock, self.db:
+            self.db.execute('DELETE FROM facts WHERE collected < ?', (time.time() - self.ttl,))
+        self.db.close()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3.8
+
+import argparse
+import gzip
+import json
+
+from rules import RULES, SEVERITIES
+
+SARIF_SCHEMA = "https://json.schemastore.org/sarif-2.1.0.json"
+SARIF_LEVELS = {"error": "error", "warning": "warning", "info": "note"}
+
+# Findings are dicts with the fields of rules.Finding; the findings of one
+# device are always written one after the other.
+
+
+def open_text(path, mode="r"):
+    """`path`, gzipped when it ends in .gz."""
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t")
+    return open(path, mode)
+
+
+class JsonLines:
+    """Findings written one JSON object per line, as the devices are scanned."""
+
+    def __init__(self, path):
+        self.file = open_text(path, "w")
+
+    def write(self, findings):
+        for finding in findings:
+            self.file.write(json.dumps(finding) + "\n")
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class Sarif:
+    """Findings written as a SARIF 2.1.0 log, one result at a time.
+
+    The log is a single JSON document, so it is only complete once closed;
+    every rule is described up front and every result comes after it.
+    """
+
+    def __init__(self, path, names):
+        self.file = open_text(path, "w")
+        self.results = 0
+        rules = [{"id": name,
+                  "defaultConfiguration": {"level": SARIF_LEVELS[RULES[name].severity]},
+                  "help": {"text": RULES[name].remediation or ""}}
+                 for name in names]
+        self.file.write('{"$schema": ' + json.dumps(SARIF_SCHEMA) +
+                        ', "version": "2.1.0", "runs": [{"tool": ' +
+                        json.dumps({"driver": {"name": "switch-ios-scanner", "rules": rules}}) +
+                        ', "results": [')
+
+    def write(self, findings):
+        for finding in findings:
+            locations = [{"name": finding["device"], "kind": "device"}] + [
+                {"name": interface, "kind": "interface",
+                 "fullyQualifiedName": "{}/{}".format(finding["device"], interface)}
+                for interface in finding["interfaces"]]
+            result = {
+                "ruleId": finding["check"],
+                "level": SARIF_LEVELS[finding["severity"]],
+                "message": {"text": finding["message"]},
+                "locations": [{"logicalLocations": locations}],
+                "properties": {key: finding[key] for key in ("device", "vlans", "remediation")},
+            }
+            self.file.write((",\n" if self.results else "\n") + json.dumps(result))
+            self.results += 1
+        self.file.flush()
+
+    def close(self):
+        self.file.write('\n]}]}\n')
+        self.file.close()
+
+
+def open_writers(jsonl=None, sarif=None, names=()):
+    writers = []
+    if jsonl:
+        writers.append(JsonLines(jsonl))
+    if sarif:
+        writers.append(Sarif(sarif, names))
+    return writers
+
+
+def aggregate(paths):
+    """Per check counts of the findings in JSON lines files.
+
+    Files are read a line at a time and only counters are kept, so memory
+    does not grow with the number of findings. A device is counted once per
+    check because its findings are written together.
+    """
+    summary = {}
+    last_device = {}
+    devices = 0
+    previous = None
+    for path in paths:
+        with open_text(path) as file:
+            for line in file:
+                finding = json.loads(line)
+                check = summary.setdefault(finding["check"], {
+                    "severity": finding["severity"], "findings": 0, "devices": 0,
+                    "interfaces": 0, "vlans": 0})
+                check["findings"] += 1
+                check["interfaces"] += len(finding["interfaces"])
+                check["vlans"] += len(finding["vlans"])
+                if last_device.get(finding["check"]) != finding["device"]:
+                    last_device[finding["check"]] = finding["device"]
+                    check["devices"] += 1
+                if finding["device"] != previous:
+                    previous = finding["device"]
+                    devices += 1
+                check["severity"] = min(check["severity"], finding["severity"],
+                                        key=SEVERITIES.index)
+    return {"devices": devices, "checks": summary}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Summarise the findings of JSON lines files, e.g. of every site.")
+    parser.add_argument("files", nargs="+", help="findings files, possibly gzipped")
+    parser.add_argument("-o", "--output", help="also write the summary to this JSON file")
+    options = parser.parse_args()
+
+    summary = aggregate(options.files)
+    checks = sorted(summary["checks"].items(), key=lambda item: -item[1]["findings"])
+    print("{:<40} {:<8} {:>10} {:>8} {:>11} {:>8}".format(
+        "check", "severity", "findings", "devices", "interfaces", "vlans"))
+    for name, check in checks:
+        print("{:<40} {:<8} {:>10} {:>8} {:>11} {:>8}".format(
+            name, check["severity"], check["findings"], check["devices"],
+            check["interfaces"], check["vlans"]))
+    print("{} devices with findings".format(summary["devices"]))
+    if options.output:
+        with open(options.output, "w") as file:
+            json.dump(summary, file, indent=4)
+
+
+if __name__ == "__main__":
+    main()
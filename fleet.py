@@ -0,0 +1,225 @@
+#!/usr/bin/env python3.8
+
+import argparse
+import json
+import time
+from collections import Counter, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import checks  # registers the rules
+from cache import MAX_AGE, MAX_DEVICES, ResultCache, change_probe, state_digest
+from facts import FACTS_TTL, FactsCache, known_inputs
+from metrics import write_profile, write_prometheus
+from pool import make_pool
+from findings import open_writers
+from rules import ANSI, Scan, all_checks, check_findings, result_of
+from session import check_args
+from transcript import recorded_devices
+
+CONCURRENCY = 64
+SITE_CONCURRENCY = 8
+
+
+def load_inventory(path):
+    with open(path) as file:
+        inventory = json.load(file)
+    if "DEVICES" not in inventory:
+        raise Exception("DEVICES should be mentioned in " + path)
+    devices = []
+    for entry in inventory["DEVICES"]:
+        device = dict(inventory.get("DEFAULTS", {}))
+        device.update(entry)
+        device.setdefault("ENABLE_PASSWD", "")
+        device.setdefault("NAME", device.get("IP"))
+        device.setdefault("SITE", "default")
+        check_args(device)
+        devices.append(device)
+    inventory["DEVICES"] = devices
+    return inventory
+
+
+def scan_device(device, checks, cache=None, facts_cache=None):
+    """Report of one device; recordings and replays always run every command.
+
+    A recording reusing cached results would only keep the few commands the
+    cache needed, and a transcript has no later changes to cache.
+    """
+    if device.get("REPLAY"):
+        cache = None
+    start = time.time()
+    report = {"device": device["NAME"], "ip": device["IP"], "site": device["SITE"]}
+    session = make_pool(device)
+    try:
+        session.open()
+        facts = facts_cache.lookup(device) if facts_cache else None
+        scan = Scan(session, known_inputs(session, facts))
+        version = scan.input('version')
+        report["model"], report["ios"] = version.model, version.ios
+        probe = cache.probe(scan, device) if cache else None
+        cached = cache.lookup(device, probe, checks) \
+            if cache and not device.get("RECORD") else None
+        if cached is not None:
+            report["checks"], report["findings"] = cached
+            report["cached"] = True
+        else:
+            scan.collect(checks)
+            found = {name: check_findings(scan, name, device["NAME"]) for name in checks}
+            report["checks"] = {name: result_of(findings, scan.skipped(name))
+                                for name, findings in found.items()}
+            report["findings"] = [finding._asdict() for findings in found.values()
+                                  for finding in findings]
+            if cache:
+                previous = cache.digest(device)
+                digest = state_digest(scan.outputs, change_probe(device, version))
+                if previous:
+                    report["changed"] = previous != digest
+                cache.store(device, probe, digest, report["checks"], report["findings"])
+            if facts_cache and facts is None:
+                facts_cache.store(device, scan.input('facts'))
+        report["status"] = "scanned"
+    except Exception as error:
+        report["status"] = "unreachable"
+        report["error"] = ANSI.sub('', str(error))
+    finally:
+        session.close()
+    report["profile"] = session.profile.report()
+    report["elapsed"] = round(time.time() - start, 3)
+    return report
+
+
+def scan_fleet(inventory, checks, concurrency=None, site_concurrency=None, cache=None,
+               facts_cache=None):
+    """Scan every device of the inventory, yielding one report per device.
+
+    At most `concurrency` devices are scanned at once and at most
+    `site_concurrency` of them belong to the same site. Devices are only
+    handed to the pool when their site has a free slot, so a big site never
+    holds worker threads that other sites could use. With a ResultCache,
+    devices whose configuration did not change reuse their last results;
+    with a FactsCache, scans reuse the version, interfaces and VLANs of a
+    recent scan of the device instead of asking for them.
+    """
+    concurrency = concurrency or inventory.get("CONCURRENCY", CONCURRENCY)
+    site_concurrency = site_concurrency or inventory.get("SITE_CONCURRENCY", SITE_CONCURRENCY)
+    pending = {}
+    for device in inventory["DEVICES"]:
+        pending.setdefault(device["SITE"], deque()).append(device)
+    running = Counter()
+    futures = {}
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        while pending or futures:
+            for site in list(pending):
+                while pending[site] and len(futures) < concurrency and \
+                      running[site] < site_concurrency:
+                    futures[pool.submit(scan_device, pending[site].popleft(), checks,
+                                        cache, facts_cache)] = site
+                    running[site] += 1
+                if not pending[site]:
+                    del pending[site]
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                running[futures.pop(future)] -= 1
+                yield future.result()
+
+
+def summary(report):
+    if report["status"] != "scanned":
+        return "{} {}: {}".format(report["device"], report["status"], report["error"])
+    results = [check["result"] for check in report["checks"].values()]
+    flagged = sum(1 for check in report["checks"].values() if "warnings" in check)
+    return "{} {} in {}s: {} passed, {} failed, {} with warnings".format(
+        report["device"], "unchanged" if report.get("cached") else "scanned",
+        report["elapsed"], results.count("passed"), results.count("failed"), flagged)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scan a fleet of switches.")
+    parser.add_argument("inventory", nargs="?",
+                        help="inventory file, see inventory.json; defaults to every "
+                             "device recorded in the --replay directory")
+    parser.add_argument("-o", "--output", default="fleet_results.json",
+                        help="where to write the per device results")
+    parser.add_argument("-k", dest="keyword", help="only run checks matching this substring")
+    parser.add_argument("-c", "--concurrency", type=int, help="devices scanned at once")
+    parser.add_argument("-s", "--site-concurrency", type=int,
+                        help="devices of the same site scanned at once")
+    parser.add_argument("--sessions", type=int, choices=range(1, 17), metavar="1-16",
+                        help="vty sessions opened to every device to send commands in "
+                             "parallel")
+    parser.add_argument("--record", metavar="DIR",
+                        help="save every command and response to DIR/<device>.json.gz")
+    parser.add_argument("--replay", metavar="DIR",
+                        help="scan the transcripts saved in DIR instead of the switches")
+    parser.add_argument("--profile", metavar="FILE",
+                        help="write the time, bytes and pages of every login, command "
+                             "and check of every device to FILE as JSON")
+    parser.add_argument("--metrics", metavar="FILE",
+                        help="write the same figures to FILE in the Prometheus text format")
+    parser.add_argument("--facts", metavar="FILE",
+                        help="SQLite file keeping the model, IOS version, interfaces and "
+                             "VLANs of every device for --facts-ttl")
+    parser.add_argument("--facts-ttl", type=float, default=FACTS_TTL / 3600, metavar="HOURS",
+                        help="ask the devices for their facts again after this many hours")
+    parser.add_argument("--findings", metavar="FILE",
+                        help="write every finding to FILE as JSON lines while scanning "
+                             "(gzipped if FILE ends in .gz)")
+    parser.add_argument("--sarif", metavar="FILE", help="write every finding to FILE as SARIF")
+    parser.add_argument("--cache", metavar="FILE",
+                        help="SQLite file keeping the last results of every device; "
+                             "devices whose configuration did not change reuse them")
+    parser.add_argument("--cache-max-age", type=float, default=MAX_AGE / 86400,
+                        metavar="DAYS", help="rescan devices in full after this many days")
+    parser.add_argument("--cache-max-devices", type=int, default=MAX_DEVICES,
+                        metavar="N", help="devices kept in the cache")
+    options = parser.parse_args()
+
+    if options.inventory:
+        inventory = load_inventory(options.inventory)
+    elif options.replay:
+        inventory = recorded_devices(options.replay)
+    else:
+        parser.error("an inventory is needed unless --replay is used")
+    for device in inventory["DEVICES"]:
+        if options.record:
+            device["RECORD"] = options.record
+        if options.replay:
+            device["REPLAY"] = options.replay
+        if options.sessions:
+            device["SESSIONS"] = options.sessions
+    cache = ResultCache(options.cache, options.cache_max_age * 86400,
+                        options.cache_max_devices) if options.cache else None
+    facts_cache = FactsCache(options.facts, options.facts_ttl * 3600) \
+        if options.facts else None
+    checks = all_checks(options.keyword)
+    writers = open_writers(options.findings, options.sarif, checks)
+    start = time.time()
+    reports = []
+    profiles = {}
+    try:
+        for report in scan_fleet(inventory, checks, options.concurrency,
+                                 options.site_concurrency, cache, facts_cache):
+            profiles[report["device"]] = report.pop("profile")
+            findings = report.pop("findings", [])
+            for writer in writers:
+                writer.write(findings)
+            reports.append(report)
+            print(summary(report))
+    finally:
+        if cache:
+            cache.close()
+        if facts_cache:
+            facts_cache.close()
+        for writer in writers:
+            writer.close()
+    with open(options.output, "w") as file:
+        json.dump(reports, file, indent=4)
+    if options.profile:
+        write_profile(options.profile, profiles)
+    if options.metrics:
+        write_prometheus(options.metrics, profiles)
+    print("{} devices scanned in {:.1f}s, results in {}".format(
+        len(reports), time.time() - start, options.output))
+
+
+if __name__ == "__main__":
+    main()
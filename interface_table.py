@@ -0,0 +1,62 @@
+#!/usr/bin/env python3.8
+
+import regex as re
+
+RE_PORT_SECURITY = re.compile(r"^ *([A-Za-z]+[0-9/.]+) +[0-9]+ +[0-9]+ +[0-9]+ +([A-Za-z]+)",
+                              re.MULTILINE)
+RE_CDP = re.compile(r"^([A-Za-z-]+[0-9/.]+) is (.*),(.*)$", re.MULTILINE)
+SHORT_NAMES = [("TenGigabitEthernet", "Te"), ("TwoGigabitEthernet", "Tw"),
+               ("FortyGigabitEthernet", "Fo"), ("HundredGigE", "Hu"),
+               ("GigabitEthernet", "Gi"), ("FastEthernet", "Fa"),
+               ("Port-channel", "Po"), ("Ethernet", "Et")]
+
+
+def short_name(interface):
+    for long, short in SHORT_NAMES:
+        if interface.startswith(long):
+            return short + interface[len(long):]
+    return interface
+
+
+def parse_port_security(response):
+    return dict(RE_PORT_SECURITY.findall(response))
+
+
+def parse_cdp(response):
+    return {short_name(name): status.strip()
+            for name, status, _ in RE_CDP.findall(response.replace('\r', ''))}
+
+
+def configured_violations(running_config):
+    violations = {}
+    for header, rows in running_config.sections('interface '):
+        for row in rows:
+            if row.startswith('switchport port-security violation '):
+                violations[short_name(header.split(' ')[1])] = row.split(' ')[-1].capitalize()
+    return violations
+
+
+class InterfaceTable:
+    """Per-interface state of a switch, collected with a few bulk commands.
+
+    `show port-security` lists only the secured ports together with their
+    violation action and `show cdp interface` lists every CDP enabled port,
+    so three commands replace one round trip per port and per check. The
+    violation action configured on ports without port-security comes from
+    the running-config, as `show port-security interface` would report it.
+    """
+
+    def __init__(self, interfaces, port_security, cdp, violations=None):
+        self.interfaces = interfaces
+        self.port_security = port_security
+        self.cdp = cdp
+        self.violations = violations or {}
+
+    def connected(self):
+        return [name for name, status in self.interfaces if status == "connected"]
+
+    def violation_mode(self, interface):
+        # Ports without port-security keep the IOS default action.
+        if interface in self.port_security:
+            return self.port_security[interface]
+        return self.violations.get(interface, "Shutdown")
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3.8
+
+import json
+import os
+import threading
+
+from rules import plan
+
+PREFIX = "switch_scan_"
+
+
+class Profile:
+    """Where the time of the scans of one device went.
+
+    Sessions report every login and every command with its latency, the
+    bytes that came back, the --More-- pages it went through and whether
+    the read ended on its timeout instead of the prompt. The sessions of a
+    SessionPool share one profile.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.logins = 0
+        self.login_seconds = 0.0
+        self.commands = {}
+        self.checks = {}
+
+    def login(self, seconds):
+        with self.lock:
+            self.logins += 1
+            self.login_seconds += seconds
+
+    def command(self, command, seconds, size, pages, timed_out):
+        with self.lock:
+            cost = self.commands.setdefault(command.strip(), {
+                "count": 0, "seconds": 0.0, "bytes": 0, "pages": 0, "timeouts": 0})
+            cost["count"] += 1
+            cost["seconds"] += seconds
+            cost["bytes"] += size
+            cost["pages"] += pages
+            cost["timeouts"] += timed_out
+
+    def check(self, name, seconds):
+        """Time spent evaluating a rule, including the commands only it sent."""
+        with self.lock:
+            self.checks[name] = self.checks.get(name, 0.0) + seconds
+
+    def report(self):
+        checks = {}
+        for name, seconds in self.checks.items():
+            # A command shared by several rules counts for each of them.
+            commands = [command for command, _ in plan([name]) if command in self.commands]
+            checks[name] = {
+                "commands": commands,
+                "seconds": round(seconds + sum(self.commands[command]["seconds"]
+                                               for command in commands), 4),
+                "bytes": sum(self.commands[command]["bytes"] for command in commands),
+            }
+        return {
+            "logins": self.logins,
+            "login_seconds": round(self.login_seconds, 4),
+            "commands": {command: dict(cost, seconds=round(cost["seconds"], 4))
+                         for command, cost in self.commands.items()},
+            "checks": checks,
+        }
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+COMMAND_METRICS = (
+    ("count", "commands_total", "Commands sent"),
+    ("seconds", "command_seconds_total", "Time until the prompt came back"),
+    ("bytes", "command_bytes_total", "Bytes of output received"),
+    ("pages", "command_pages_total", "--More-- pages read"),
+    ("timeouts", "command_timeouts_total", "Reads that ended on their timeout, not the prompt"),
+)
+
+
+def prometheus(profiles):
+    """Prometheus text exposition of {device: Profile.report()}."""
+    families = [
+        ("logins_total", "counter", "Logins to the device, reconnects included",
+         lambda report: [({}, report["logins"])]),
+        ("login_seconds_total", "counter", "Time spent logging in",
+         lambda report: [({}, report["login_seconds"])]),
+    ]
+    for key, name, help_text in COMMAND_METRICS:
+        families.append((name, "counter", help_text,
+                         lambda report, key=key: [({"command": command}, cost[key])
+                                                  for command, cost in report["commands"].items()]))
+    families.append(("check_seconds", "gauge", "Time of a check, its commands included",
+                     lambda report: [({"check": check}, cost["seconds"])
+                                     for check, cost in report["checks"].items()]))
+    rows = []
+    for name, kind, help_text, samples in families:
+        rows.append("# HELP {}{} {}".format(PREFIX, name, help_text))
+        rows.append("# TYPE {}{} {}".format(PREFIX, name, kind))
+        for device, report in profiles.items():
+            for labels, value in samples(report):
+                labels = dict({"device": device}, **labels)
+                rows.append("{}{}{{{}}} {}".format(PREFIX, name, ",".join(
+                    '{}="{}"'.format(key, _label(text)) for key, text in labels.items()), value))
+    return "\n".join(rows) + "\n"
+
+
+def write_profile(path, profiles):
+    with open(path, "w") as file:
+        json.dump(profiles, file, indent=4)
+
+
+def write_prometheus(path, profiles):
+    # Written aside and renamed, so a scraper never reads half a file.
+    with open(path + ".tmp", "w") as file:
+        file.write(prometheus(profiles))
+    os.replace(path + ".tmp", path)
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3.8
+
+import argparse
+import hashlib
+import heapq
+import json
+import random
+import signal
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import regex as re
+
+from cache import change_probe, comparable, run_probe
+from facts import known_inputs
+from fleet import load_inventory
+from metrics import write_prometheus
+from pool import make_pool
+from rules import ANSI, Scan, affected, all_checks, check_findings, result_of
+
+INTERVAL = 300
+JITTER = 0.2
+MAX_CPU = 60
+MAX_LATENCY = 2.0
+MAX_BACKOFF = 8
+CONCURRENCY = 64
+CPU_COMMAND = 'show processes cpu | include CPU utilization'
+RE_CPU = re.compile(r"CPU utilization for five seconds: ([0-9]+)%")
+
+
+class DeviceMonitor:
+    """One device watched by the daemon: its warm session, last state and pace.
+
+    The session stays open between scans. Every scan first reads the
+    switch's CPU load and how long that took; a loaded switch is left alone
+    and rescanned later, waiting twice as long each time up to MAX_BACKOFF
+    intervals, and the pace comes back down once it is idle again. Only
+    once the load allows a scan is the change probe of the platform sent,
+    so at most once per delay; the running-config is only fetched again
+    when its answer changed or is empty (e.g. no logging buffer), and only
+    the rules reading an output that changed are evaluated again.
+    """
+
+    def __init__(self, device, checks, interval=INTERVAL, max_cpu=MAX_CPU,
+                 max_latency=MAX_LATENCY):
+        self.device = device
+        self.checks = checks
+        self.interval = interval
+        self.max_cpu = max_cpu
+        self.max_latency = max_latency
+        self.backoff = 1
+        self.session = None
+        self.profile = None
+        self.probe_command = None
+        self.probe = None
+        self.running_config = None
+        self.digests = {}
+        self.results = {}
+
+    def delay(self, jitter=JITTER):
+        """Seconds until the next scan, spread by `jitter` so scans do not align."""
+        return self.interval * self.backoff * random.uniform(1 - jitter, 1 + jitter)
+
+    def load(self):
+        """(five seconds CPU %, seconds it took to tell) of the switch."""
+        start = time.monotonic()
+        response = self.session.run_many([(CPU_COMMAND, 2)])[CPU_COMMAND]
+        # A timed out answer is a CommandTimeout, the latency tells it is busy.
+        match = RE_CPU.search(response) if isinstance(response, str) else None
+        return int(match.group(1)) if match else 0, time.monotonic() - start
+
+    def poll(self):
+        """Scan the device unless it is loaded; the events of this scan."""
+        name = self.device["NAME"]
+        try:
+            if self.session is None:
+                self.session = make_pool(self.device).open()
+                self.profile = self.session.profile
+            cpu, latency = self.load()
+            if cpu >= self.max_cpu or latency >= self.max_latency:
+                self.backoff = min(self.backoff * 2, MAX_BACKOFF)
+                return [{"device": name, "event": "busy", "cpu": cpu,
+                         "latency": round(latency, 3)}]
+            self.backoff = max(self.backoff // 2, 1)
+            return self.scan()
+        except Exception as error:
+            if self.session is not None:
+                self.session.close()
+            self.session = None
+            self.backoff = min(self.backoff * 2, MAX_BACKOFF)
+            return [{"device": name, "event": "unreachable",
+                     "error": ANSI.sub('', str(error))}]
+
+    def scan(self):
+        name = self.device["NAME"]
+        scan = Scan(self.session, known_inputs(self.session))
+        if self.probe_command is None:
+            self.probe_command = change_probe(self.device, scan.inputs.get('version'))
+        probe = run_probe(scan, self.probe_command)
+        if probe and probe == self.probe and self.running_config is not None:
+            scan.inputs['running_config'] = self.running_config
+        scan.collect(self.checks)
+        digests = {command: hashlib.sha256(comparable(output).encode()).digest()
+                   for command, output in scan.outputs.items()
+                   if command != self.probe_command}
+        changed = {command for command, digest in digests.items()
+                   if self.digests.get(command) != digest}
+        names = affected(self.checks, changed) if self.results else self.checks
+        events = []
+        for check in names:
+            result = result_of(check_findings(scan, check, name), scan.skipped(check))
+            previous = self.results.get(check)
+            if previous is not None and previous != result:
+                events.append({"device": name, "event": "drift", "check": check,
+                               "result": result, "previous": previous})
+            self.results[check] = result
+        self.digests.update(digests)
+        self.probe = probe
+        self.running_config = scan.inputs.get('running_config')
+        events.append({"device": name, "event": "scanned", "changed": sorted(changed),
+                       "evaluated": names})
+        return events
+
+    def close(self):
+        if self.session is not None:
+            self.session.close()
+            self.session = None
+
+
+def watch(monitors, concurrency=CONCURRENCY, jitter=JITTER, rounds=None):
+    """Scan the monitors forever (or `rounds` times each), yielding (monitor, events).
+
+    The first scans are spread over one interval; every scan after that
+    is due its monitor's delay after the previous one ended.
+    """
+    due = [(random.uniform(0, device.interval), index) for index, device in enumerate(monitors)]
+    heapq.heapify(due)
+    start = time.monotonic()
+    scans = [0] * len(monitors)
+    running = {}
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        while due or running:
+            now = time.monotonic() - start
+            while due and due[0][0] <= now and len(running) < concurrency:
+                _, index = heapq.heappop(due)
+                running[pool.submit(monitors[index].poll)] = index
+            timeout = max(due[0][0] - now, 0) if due and len(running) < concurrency else None
+            done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                index = running.pop(future)
+                scans[index] += 1
+                yield monitors[index], future.result()
+                if rounds is None or scans[index] < rounds:
+                    heapq.heappush(due, (time.monotonic() - start +
+                                         monitors[index].delay(jitter), index))
+
+
+def stop(signum, frame):
+    sys.exit(0)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Watch a fleet of switches and report configuration drift.")
+    parser.add_argument("inventory", help="inventory file, see inventory.json")
+    parser.add_argument("-k", dest="keyword", help="only run checks matching this substring")
+    parser.add_argument("-i", "--interval", type=float, default=INTERVAL,
+                        help="seconds between two scans of a device")
+    parser.add_argument("--jitter", type=float, default=JITTER,
+                        help="fraction of the interval scans are randomly moved by")
+    parser.add_argument("--max-cpu", type=int, default=MAX_CPU,
+                        help="five seconds CPU %% above which a device is left alone")
+    parser.add_argument("--max-latency", type=float, default=MAX_LATENCY,
+                        help="seconds to report the CPU load above which a device is left alone")
+    parser.add_argument("-c", "--concurrency", type=int, default=CONCURRENCY,
+                        help="devices scanned at once")
+    parser.add_argument("--sessions", type=int, choices=range(1, 17), metavar="1-16",
+                        help="vty sessions kept open to every device")
+    parser.add_argument("--rounds", type=int, help="stop after scanning every device this often")
+    parser.add_argument("--events", metavar="FILE",
+                        help="append every drift, busy and unreachable event to FILE as JSON lines")
+    parser.add_argument("--metrics", metavar="FILE",
+                        help="keep the Prometheus profile of every device in FILE")
+    options = parser.parse_args()
+
+    inventory = load_inventory(options.inventory)
+    checks = all_checks(options.keyword)
+    monitors = []
+    for device in inventory["DEVICES"]:
+        if options.sessions:
+            device["SESSIONS"] = options.sessions
+        monitors.append(DeviceMonitor(device, checks, options.interval, options.max_cpu,
+                                      options.max_latency))
+    events = open(options.events, "a") if options.events else None
+    signal.signal(signal.SIGTERM, stop)
+    try:
+        for _, found in watch(monitors, options.concurrency, options.jitter, options.rounds):
+            for event in found:
+                event["time"] = round(time.time(), 3)
+                if event["event"] != "scanned":
+                    print(json.dumps(event))
+                    if events:
+                        events.write(json.dumps(event) + "\n")
+                        events.flush()
+            if options.metrics:
+                write_prometheus(options.metrics,
+                                 {device.device["NAME"]: device.profile.report()
+                                  for device in monitors if device.profile is not None})
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for device in monitors:
+            device.close()
+        if events:
+            events.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3.8
+
+from collections import namedtuple
+
+import regex as re
+
+Interface = namedtuple("Interface", "name status")
+Vlan = namedtuple("Vlan", "number name")
+IpInterface = namedtuple("IpInterface", "name address ok method status protocol")
+ErrdisableCause = namedtuple("ErrdisableCause", "cause detection")
+IgmpSnooping = namedtuple("IgmpSnooping", "vlan enabled")
+
+RE_INTERFACE = re.compile(r"((Fa|Gi)([0-9]*/)*[0-9]*) +(notconnect|connected|disabled)")
+RE_VLAN = re.compile(r"([0-9]+) +([a-zA-Z0-9]*) +active")
+RE_IP_INTERFACE = re.compile(r"(FastEthernet|GigabitEthernet|Vlan)[0-9/]*")
+RE_ERRDISABLE = re.compile(r"^(\S.*?) +(Enabled|Disabled)\b")
+RE_IGMP_VLAN = re.compile(r"^Vlan ([0-9]+):")
+RE_IGMP_SNOOPING = re.compile(r"^IGMP snooping +: (Enabled|Disabled)")
+
+# Each parser reads the rows of one command's output as they arrive from
+# the switch and yields a record per row it understands, so no output is
+# held in memory whole and parsing goes on while the switch still sends.
+
+
+def interfaces(lines):
+    """`show interfaces status` -> Interface(name, status)"""
+    for line in lines:
+        match = RE_INTERFACE.search(line)
+        if match:
+            yield Interface(match.group(1), match.group(4))
+
+
+def vlans(lines):
+    """`show vlan brief` -> Vlan(number, name) of every active VLAN"""
+    for line in lines:
+        match = RE_VLAN.search(line)
+        if match:
+            yield Vlan(match.group(1), match.group(2))
+
+
+def ip_interfaces(lines):
+    """`show ip interface brief` -> IpInterface of the Fa, Gi and Vlan interfaces"""
+    for line in lines:
+        match = RE_IP_INTERFACE.search(line)
+        if match:
+            fields = line[match.end():].split()
+            if len(fields) >= 5:
+                address, ok, method, *status, protocol = fields
+                yield IpInterface(match.group(), address, ok, method, " ".join(status),
+                                  protocol)
+
+
+def errdisable(lines):
+    """`show errdisable detect` -> ErrdisableCause(cause, detection)"""
+    for line in lines:
+        match = RE_ERRDISABLE.search(line)
+        if match:
+            yield ErrdisableCause(match.group(1), match.group(2))
+
+
+def igmp_snooping(lines):
+    """`show ip igmp snooping [vlan N]` -> IgmpSnooping(vlan, enabled) of every VLAN listed
+
+    Snooping turned off globally is off on every VLAN, whatever the VLAN says.
+    """
+    vlan = None
+    enabled = True
+    for line in lines:
+        match = RE_IGMP_VLAN.search(line)
+        if match:
+            vlan = match.group(1)
+            continue
+        match = RE_IGMP_SNOOPING.search(line)
+        if match:
+            if vlan is None:
+                enabled = match.group(1) == "Enabled"
+            else:
+                yield IgmpSnooping(vlan, enabled and match.group(1) == "Enabled")
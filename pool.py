@@ -0,0 +1,132 @@
+#!/usr/bin/env python3.8
+
+import queue
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+
+from termcolor import colored
+
+from metrics import Profile
+from session import Session
+from transcript import make_session
+
+
+class SessionPool:
+    """Several CLI sessions to one switch, sending independent commands at once.
+
+    The first session logs in as usual; the others are opened alongside it,
+    over extra vty lines for Telnet or as extra channels of the first
+    session's Transport for SSH. A switch refusing some of them (all vty
+    lines busy) only makes the pool smaller.
+
+    `run_many` hands the slowest commands out first, each to whichever
+    session is idle, so a scan takes about as long as its slowest command
+    instead of the sum of them. How slow a command is comes from its last
+    run in this pool, or from its timeout before that.
+    """
+
+    def __init__(self, args, size):
+        self.args = args
+        self.size = size
+        self.sessions = []
+        self.idle = queue.Queue()
+        self.latency = {}
+        self.executor = None
+        self.profile = Profile()
+
+    @property
+    def hostname(self):
+        return self.sessions[0].hostname if self.sessions else None
+
+    @property
+    def version(self):
+        return self.sessions[0].version if self.sessions else None
+
+    def open(self):
+        first = make_session(self.args)
+        first.profile = self.profile
+        ssh = self.args['PROTOCOL'] == "ssh"
+        self.executor = ThreadPoolExecutor(max_workers=self.size)
+        extras = []
+        try:
+            if ssh:
+                # The extra channels need the first session's Transport.
+                first.open()
+            extras = [self.executor.submit(self._open_extra, first)
+                      for _ in range(self.size - 1)]
+            if not ssh:
+                first.open()
+        except Exception:
+            for future in extras:
+                if not future.exception():
+                    future.result().close()
+            first.close()
+            self.executor.shutdown()
+            self.executor = None
+            raise
+        self.sessions = [first]
+        for future in extras:
+            try:
+                self.sessions.append(future.result())
+            except Exception as error:
+                warnings.warn(colored("{} refused an extra session, scanning with fewer: {}"
+                                      .format(self.args["IP"], str(error) or type(error).__name__),
+                                      "yellow"), Warning)
+        for session in self.sessions:
+            self.idle.put(session)
+        return self
+
+    def _open_extra(self, first):
+        session = Session(self.args)
+        session.profile = self.profile
+        session.transport = first.transport
+        try:
+            return session.open()
+        except Exception:
+            if first.transport is None:
+                raise
+            # Many IOS releases serve a single channel per SSH connection.
+            session.close()
+            session = Session(self.args)
+            session.profile = self.profile
+            return session.open()
+
+    def _run(self, command, timeout, parsers):
+        session = self.idle.get()
+        try:
+            start = time.time()
+            response = session.run_many([(command, timeout)], parsers)[command]
+            self.latency[command] = time.time() - start
+            return response
+        finally:
+            self.idle.put(session)
+
+    def run_many(self, commands, parsers=None):
+        """Responses of (command, timeout) pairs, keyed by command, see Session.run_many."""
+        commands = sorted(commands, key=lambda pair: -self.latency.get(*pair))
+        futures = [(command, self.executor.submit(self._run, command, timeout, parsers))
+                   for command, timeout in commands]
+        return {command: future.result() for command, future in futures}
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+        # The first session owns the SSH Transport, it is closed last.
+        for session in reversed(self.sessions):
+            session.close()
+        self.sessions = []
+        self.idle = queue.Queue()
+
+
+def make_pool(args):
+    """Session, or pool of SESSIONS sessions, for a device.
+
+    Recorded and replayed devices always use a single session: a replay has
+    no latency to hide and a recording is kept by one session.
+    """
+    size = int(args.get("SESSIONS", 1))
+    if size <= 1 or args.get("RECORD") or args.get("REPLAY"):
+        return make_session(args)
+    return SessionPool(args, size)
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3.8
+
+import importlib
+import re
+import time
+from collections import namedtuple
+
+SEVERITIES = ("error", "warning", "info")
+INPUTS = {}
+RULES = {}
+# Modules whose rules registry() imports on first use.
+RULE_MODULES = ("checks",)
+ANSI = re.compile(r"\x1b\[[0-9;]*m")
+
+# One problem (or piece of information) a rule reported about a device.
+Finding = namedtuple("Finding", "check severity device message interfaces vlans remediation")
+
+
+class Input:
+    """Data the rules can ask for: the commands producing it and its parser.
+
+    The parser receives the raw response of each command, then the inputs
+    it needs by name. A parser taking a `run` argument may send follow-up
+    commands that depend on other inputs. A `stream` input has a single
+    command whose rows are fed to the parser, a generator of records, while
+    they arrive; that command's output is never kept as text.
+    """
+
+    def __init__(self, name, commands, parse, needs=(), timeout=1, stream=False):
+        if stream and len(commands) != 1:
+            raise Exception("The stream input {} should have a single command".format(name))
+        self.name = name
+        self.commands = commands
+        self.parse = parse
+        self.needs = needs
+        self.timeout = timeout
+        self.stream = stream
+        code = parse.__code__
+        self.dynamic = 'run' in code.co_varnames[:code.co_argcount + code.co_kwonlyargcount]
+
+
+class Rule:
+    """A check: the inputs it reads, its severity and its evaluation.
+
+    `evaluate` yields one message per problem found; a message may also be
+    a (severity, message) tuple, e.g. to report information next to the
+    problems. `remediation` is the command fixing what the rule reports.
+    `unsupported` lists the prefixes of the models, as read by the
+    `version` input, the rule does not apply to.
+    """
+
+    def __init__(self, name, severity, needs, evaluate, remediation=None, unsupported=()):
+        if severity not in SEVERITIES:
+            raise Exception("Unknown severity {} for {}".format(severity, name))
+        self.name = name
+        self.severity = severity
+        self.needs = needs
+        self.evaluate = evaluate
+        self.remediation = remediation
+        self.unsupported = tuple(unsupported)
+
+
+class Message(str):
+    """A message naming the interfaces and VLANs it is about.
+
+    It reads as the plain message everywhere; findings also pick up its
+    interfaces, VLANs and remediation, which overrides the rule's.
+    """
+
+    def __new__(cls, text, interfaces=(), vlans=(), remediation=None):
+        message = super().__new__(cls, text)
+        message.interfaces = tuple(interfaces)
+        message.vlans = tuple(vlans)
+        message.remediation = remediation
+        return message
+
+
+def source(name, *commands, needs=(), timeout=1, stream=False):
+    def register(parse):
+        INPUTS[name] = Input(name, commands, parse, needs, timeout, stream)
+        return parse
+    return register
+
+
+def rule(severity, *needs, name=None, remediation=None, unsupported=()):
+    def register(evaluate):
+        RULES[name or evaluate.__name__] = Rule(name or evaluate.__name__, severity, needs,
+                                                evaluate, remediation, unsupported)
+        return evaluate
+    return register
+
+
+def registry():
+    """RULES, once the modules defining them are imported."""
+    for module in RULE_MODULES:
+        importlib.import_module(module)
+    return RULES
+
+
+def all_checks(keyword=None):
+    return [name for name in registry() if keyword is None or keyword in name]
+
+
+def plan(names, known=()):
+    """Unique (command, timeout) pairs the rules need, in first use order.
+
+    Inputs in `known` are already at hand, their commands are left out.
+    """
+    commands = {}
+
+    def visit(need):
+        if need in known:
+            return
+        source = INPUTS[need]
+        for dependency in source.needs:
+            visit(dependency)
+        for command in source.commands:
+            commands.setdefault(command, source.timeout)
+
+    for name in names:
+        for need in RULES[name].needs:
+            visit(need)
+    return list(commands.items())
+
+
+def affected(names, commands):
+    """Rules among `names` reading the output of one of `commands`.
+
+    Dynamic inputs choose their commands while they are parsed, so the
+    rules reading them always count as affected.
+    """
+    def touched(need):
+        source = INPUTS[need]
+        return source.dynamic or any(command in commands for command in source.commands) or \
+            any(touched(dependency) for dependency in source.needs)
+
+    return [name for name in names if any(touched(need) for need in RULES[name].needs)]
+
+
+class Scan:
+    """State collected from one device during one scan.
+
+    However many rules need them, every command is sent at most once and
+    every input is parsed at most once. Inputs known beforehand, e.g. a
+    saved configuration, can be given to scan without a session.
+    """
+
+    def __init__(self, session, inputs=None):
+        self.session = session
+        self.outputs = {}
+        self.inputs = dict(inputs or {})
+
+    def run(self, command, timeout=1):
+        if command not in self.outputs:
+            commands = [(command, timeout)]
+            self.outputs.update(self.session.run_many(commands, self.parsers(commands)))
+        if isinstance(self.outputs[command], Exception):
+            # The session could not read it whole, e.g. it timed out.
+            raise self.outputs[command]
+        return self.outputs[command]
+
+    def collect(self, names):
+        """Send every command the rules need, at once when the session is a pool.
+
+        Rules that do not apply to the switch are left out.
+        """
+        names = [name for name in names if not self.skipped(name)]
+        commands = [(command, timeout) for command, timeout in plan(names, self.inputs)
+                    if command not in self.outputs]
+        self.outputs.update(self.session.run_many(commands, self.parsers(commands)))
+
+    @staticmethod
+    def parsers(commands):
+        """Parsers of the stream inputs among `commands`, keyed by command."""
+        streams = {source.commands[0]: source for source in INPUTS.values() if source.stream}
+        return {command: lambda lines, source=streams[command]: list(source.parse(lines))
+                for command, _ in commands if command in streams}
+
+    def input(self, name):
+        if name not in self.inputs:
+            source = INPUTS[name]
+            if source.stream:
+                # Parsed while it was read.
+                self.inputs[name] = self.run(source.commands[0], source.timeout)
+                return self.inputs[name]
+            outputs = [self.run(command, source.timeout) for command in source.commands]
+            needs = {need: self.input(need) for need in source.needs}
+            if source.dynamic:
+                needs['run'] = self.run
+            self.inputs[name] = source.parse(*outputs, **needs)
+        return self.inputs[name]
+
+    def skipped(self, name):
+        """Why a rule does not apply to the switch, None when it does or is not known to."""
+        unsupported = RULES[name].unsupported
+        if not unsupported or (self.session is None and 'version' not in self.inputs):
+            return None
+        model = self.input('version').model
+        if model.startswith(unsupported):
+            return "{} does not apply to {}".format(name, model)
+        return None
+
+    def evaluate(self, name):
+        """(severity, message) pairs reported by a rule."""
+        start = time.monotonic()
+        rule = RULES[name]
+        results = rule.evaluate(**{need: self.input(need) for need in rule.needs})
+        results = [result if isinstance(result, tuple) else (rule.severity, result)
+                   for result in results or ()]
+        if self.session is not None:
+            self.session.profile.check(name, time.monotonic() - start)
+        return results
+
+
+def check_findings(scan, name, device=None):
+    """Findings of a rule; a rule that could not be evaluated is one error."""
+    rule = RULES[name]
+    try:
+        if scan.skipped(name):
+            return []
+        results = scan.evaluate(name)
+    except Exception as error:
+        return [Finding(name, "error", device, ANSI.sub('', str(error)), (), (), None)]
+    return [Finding(name, severity, device, str(message), getattr(message, 'interfaces', ()),
+                    getattr(message, 'vlans', ()),
+                    None if severity == "info" else
+                    getattr(message, 'remediation', None) or rule.remediation)
+            for severity, message in results]
+
+
+def result_of(findings, skipped=None):
+    """Outcome of one rule, from its findings, in the shape of a pytest run of it."""
+    if skipped:
+        return {"result": "skipped", "message": skipped}
+    found = {severity: [] for severity in SEVERITIES}
+    for finding in findings:
+        found[finding.severity].append(finding.message)
+    result = {"result": "failed", "message": "\n".join(found["error"])} \
+        if found["error"] else {"result": "passed"}
+    if found["warning"]:
+        result["warnings"] = found["warning"]
+    if found["info"]:
+        result["output"] = "\n".join(found["info"])
+    return result
+
+
+def check_result(scan, name):
+    findings = check_findings(scan, name)
+    return result_of(findings, not findings and scan.skipped(name))
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3.8
+
+
+class RunningConfig:
+    """Index over one `show running-config` output.
+
+    Global lines are kept in order and every block header (`interface ...`,
+    `line con 0`, `vlan 10`, ...) maps to its indented sub-lines, so the
+    checks can answer `| include` and `| begin` style questions locally.
+    The text may also be given as an iterable of rows, e.g. an open file,
+    which is then indexed while it is read. `unclosed` is the kind of a
+    banner whose delimiter never came, which swallowed the rest of the text.
+    """
+
+    def __init__(self, text):
+        self.lines = []
+        self.blocks = {}
+        self.banners = {}
+        self.unclosed = None
+        self._all = []
+        self._parse(text)
+
+    def _parse(self, text):
+        header = None
+        if isinstance(text, str):
+            rows = iter(text.replace('\r', '').split('\n'))
+        else:
+            rows = (row.rstrip('\r\n') for row in text)
+        for row in rows:
+            if not row.strip() or row.startswith('!'):
+                continue
+            if row.startswith('Building configuration') or \
+               row.startswith('Current configuration'):
+                continue
+            if row == 'end':
+                break
+            self._all.append(row)
+            if row[0] == ' ':
+                if header is not None:
+                    self.blocks[header].append(row[1:])
+                continue
+            header = row
+            self.lines.append(row)
+            self.blocks.setdefault(header, [])
+            if row.startswith('banner '):
+                self._parse_banner(row, rows)
+                header = None
+
+    def _parse_banner(self, row, rows):
+        # banner motd ^CWelcome^C  or a multi-line body closed by the delimiter
+        words = row.split(' ', 2)
+        if len(words) < 3:
+            return
+        kind, body = words[1], words[2]
+        if body.startswith('^'):
+            delimiter, body = body[:2], body[2:]
+        else:
+            delimiter, body = body[:1], body[1:]
+        text = []
+        while delimiter not in body:
+            text.append(body)
+            body = next(rows, None)
+            if body is None:
+                self.unclosed = kind
+                body = delimiter
+                break
+            body = body.replace('\r', '')
+            self._all.append(body)
+        text.append(body[:body.index(delimiter)])
+        self.banners[kind] = '\n'.join(part for part in text if part)
+
+    def include(self, pattern):
+        """Lines containing `pattern`, like `show running-config | include`."""
+        return [row for row in self._all if pattern in row]
+
+    def block(self, header):
+        """Sub-lines of a block, e.g. block('line con 0')."""
+        return self.blocks.get(header, [])
+
+    def sections(self, prefix):
+        """Headers and sub-lines of every block starting with `prefix`."""
+        return [(row, self.blocks[row]) for row in self.lines if row.startswith(prefix)]
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3.8
+
+import argparse
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from facts import FACTS_TTL, known_inputs
+from findings import open_writers
+from metrics import write_profile
+from pool import make_pool
+from rules import ANSI, Scan, all_checks, check_findings, result_of
+from session import check_args
+
+
+def load_args(path, sessions=None):
+    with open(path) as file:
+        args = json.load(file)
+    args.setdefault("ENABLE_PASSWD", "")
+    if sessions:
+        args["SESSIONS"] = sessions
+    check_args(args)
+    return args
+
+
+def run_checks(session, names, device, facts_cache=None):
+    """Results and findings of every rule, once their commands are all sent."""
+    facts = facts_cache.lookup(session.args) if facts_cache else None
+    scan = Scan(session, known_inputs(session, facts))
+    scan.collect(names)
+    found = {name: check_findings(scan, name, device) for name in names}
+    if facts_cache and facts is None:
+        facts_cache.store(session.args, scan.input('facts'))
+    return {name: result_of(findings, scan.skipped(name))
+            for name, findings in found.items()}, found
+
+
+def print_result(name, result):
+    print("{:<8} {}".format(result["result"].upper(), name))
+    for line in filter(None, result.get("message", "").split("\n")):
+        print("         " + ("error: " if result["result"] == "failed" else "") + line)
+    for warning in result.get("warnings", []):
+        print("         warning: " + warning)
+    for line in filter(None, result.get("output", "").split("\n")):
+        print("         " + line)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Scan the switch of config.json without pytest.")
+    parser.add_argument("-c", "--config", default="config.json",
+                        help="device to scan, in the format of config.json")
+    parser.add_argument("-k", dest="keyword", help="only run checks matching this substring")
+    parser.add_argument("-o", "--output", help="also write the results to this JSON file")
+    parser.add_argument("--facts", metavar="FILE",
+                        help="SQLite file keeping the model, IOS version, interfaces and "
+                             "VLANs of the switch for --facts-ttl")
+    parser.add_argument("--facts-ttl", type=float, default=FACTS_TTL / 3600, metavar="HOURS",
+                        help="ask the switch for its facts again after this many hours")
+    parser.add_argument("--findings", metavar="FILE",
+                        help="write every finding to FILE as JSON lines")
+    parser.add_argument("--sarif", metavar="FILE", help="write every finding to FILE as SARIF")
+    parser.add_argument("-q", "--quiet", action="store_true",
+                        help="only print the failed checks and the summary")
+    parser.add_argument("--sessions", type=int,
+                        help="vty sessions opened to send commands in parallel")
+    parser.add_argument("--list", action="store_true",
+                        help="list the checks and exit without connecting")
+    options = parser.parse_args()
+
+    if options.list:
+        print("\n".join(all_checks(options.keyword)))
+        return 0
+
+    start = time.time()
+    args = load_args(options.config, options.sessions)
+    session = make_pool(args)
+    # The login goes on while the checks are imported.
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        login = executor.submit(session.open)
+        names = all_checks(options.keyword)
+        try:
+            login.result()
+        except Exception as error:
+            session.close()
+            print("{} unreachable: {}".format(args["IP"], ANSI.sub('', str(error))),
+                  file=sys.stderr)
+            return 2
+    device = args.get("NAME") or args["IP"]
+    facts_cache = None
+    if options.facts:
+        from facts import FactsCache
+        facts_cache = FactsCache(options.facts, options.facts_ttl * 3600)
+    try:
+        results, found = run_checks(session, names, device, facts_cache)
+    finally:
+        if facts_cache:
+            facts_cache.close()
+        session.close()
+        if args.get("PROFILE"):
+            write_profile(args["PROFILE"], {device: session.profile.report()})
+    for writer in open_writers(options.findings, options.sarif, names):
+        writer.write([finding._asdict() for findings in found.values() for finding in findings])
+        writer.close()
+
+    for name, result in results.items():
+        if not options.quiet or result["result"] == "failed":
+            print_result(name, result)
+    outcomes = [result["result"] for result in results.values()]
+    flagged = sum(1 for result in results.values() if "warnings" in result)
+    print("{}: {} passed, {} failed, {} with warnings in {:.2f}s".format(
+        device, outcomes.count("passed"), outcomes.count("failed"),
+        flagged, time.time() - start))
+    if options.output:
+        with open(options.output, "w") as file:
+            json.dump({"device": device, "checks": results}, file, indent=4)
+    return 1 if "failed" in outcomes else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,375 @@
+#!/usr/bin/env python3.8
+
+import re
+import select
+import socket
+import time
+from termcolor import colored
+from metrics import Profile
+
+LOGIN_TIMEOUT = 10
+KEEPALIVE = 30
+CHUNK = 65536
+# Prompts and --More-- are only looked for at the end of what arrived so far.
+TAIL = 512
+PASSWORD = re.compile(rb'[Pp]assword: ?$')
+MORE = re.compile(rb'--More-- ?$')
+ANY_PROMPT = re.compile(rb'[\r\n]([\w.\-]+)(\([\w\-]+\))?([>#]) ?$')
+
+
+class CommandTimeout(Exception):
+    """The prompt did not come back after a command within its timeout."""
+
+
+class Session:
+    """One authenticated CLI session to a switch, shared by every check.
+
+    The session logs in once, verifies the login with `show version` and
+    transparently reconnects when the underlying Telnet/SSH connection dies.
+    SSH runs an interactive shell on a pty, like Telnet, so both read the
+    same way: output arrives as a stream of chunks, that `run` joins once and
+    `lines` splits into rows, and a read ends as soon as the `hostname#`
+    prompt comes back; the read timeout only bounds how long the session
+    waits for output that never arrives.
+    """
+
+    def __init__(self, args):
+        self.args = args
+        self.conn = None
+        self.hostname = None
+        # `show version` as read at login
+        self.version = None
+        self.prompt = None
+        self.mode = None
+        self.synced = False
+        # SSH Transport the session's channel runs over, possibly shared
+        # with the other sessions of a SessionPool.
+        self.transport = None
+        self.owns_transport = False
+        self.profile = Profile()
+        # --More-- pages of the last read
+        self.pages = 0
+
+    def open(self):
+        start = time.monotonic()
+        if self.args['PROTOCOL'] == "telnet":
+            from telnetlib import Telnet
+            self.conn = Telnet(self.args['IP'], self.args['PORT'])
+            self._tune(self.conn.get_socket())
+            self._expect([PASSWORD], LOGIN_TIMEOUT)
+            self._send(str.encode(self.args['SWITCH_PASSWORD'] + '\n'))
+        elif self.args['PROTOCOL'] == "ssh":
+            if self.transport is None or not self.transport.is_active():
+                import paramiko
+                self.transport = paramiko.Transport((self.args['IP'], self.args['PORT']))
+                # Owned from here on, so close() also ends a failed login's Transport.
+                self.owns_transport = True
+                self.transport.connect(username=self.args['USERNAME'],
+                                       password=self.args['SSH_PASSWORD'])
+                self.transport.set_keepalive(KEEPALIVE)
+                self._tune(self.transport.sock)
+            self.conn = self.transport.open_session()
+            self.conn.get_pty()
+            self.conn.invoke_shell()
+        self._learn_prompt()
+        self._enable()
+        # Paging is turned off once, so no read ever stops at --More--.
+        self.run('terminal length 0\n', LOGIN_TIMEOUT)
+
+        # Check if the connection is established
+        response = self.version = self.run('show version\n', LOGIN_TIMEOUT)
+        if len(response.split("\n")) < 4:
+            raise Exception(colored("The connection could not be established using \
+your credentials. Check them again: " + describe(self.args), "red"))
+        self.profile.login(time.monotonic() - start)
+        return self
+
+    @staticmethod
+    def _tune(sock):
+        # Commands are tiny writes answered by the switch, don't let Nagle hold them.
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+
+    def _send(self, data):
+        if hasattr(self.conn, 'sock_avail'):  # telnet
+            self.conn.write(data)
+        else:
+            self.conn.sendall(data)
+
+    def _recv(self, timeout):
+        """Next chunk of output, or None when nothing arrives for `timeout` seconds."""
+        if hasattr(self.conn, 'sock_avail'):  # telnet
+            deadline = time.monotonic() + timeout
+            while True:
+                # telnetlib hands out what is buffered 50 bytes at a time,
+                # they are gathered up to CHUNK bytes. Option negotiation
+                # alone yields nothing, keep waiting then.
+                pieces, size = [], 0
+                try:
+                    while size < CHUNK:
+                        data = self.conn.read_eager()
+                        if not data:
+                            break
+                        pieces.append(data)
+                        size += len(data)
+                except EOFError:
+                    if not pieces:
+                        raise
+                if pieces:
+                    return b''.join(pieces)
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not select.select([self.conn], [], [], remaining)[0]:
+                    return None
+        self.conn.settimeout(timeout)
+        try:
+            data = self.conn.recv(CHUNK)
+        except socket.timeout:
+            return None
+        if not data:
+            raise EOFError("the switch closed the SSH channel")
+        return data
+
+    def _expect(self, patterns, timeout):
+        """Read until one of `patterns` ends the output, like Telnet.expect.
+
+        Used while logging in; the chunks are joined once at the end and the
+        patterns are matched against the last TAIL bytes only.
+        """
+        chunks = []
+        tail = b''
+        while True:
+            data = self._recv(timeout)
+            if data is None:
+                return -1, None, b''.join(chunks)
+            chunks.append(data)
+            tail = (tail + data[-TAIL:])[-TAIL:]
+            for index, pattern in enumerate(patterns):
+                match = pattern.search(tail)
+                if match:
+                    return index, match, b''.join(chunks)
+
+    def _learn_prompt(self):
+        index, match, text = self._expect([ANY_PROMPT], LOGIN_TIMEOUT)
+        if match is None:
+            raise Exception(colored("The switch did not answer with a prompt \
+after login. Check your credentials: " + describe(self.args), "red"))
+        self.hostname = match.group(1)
+        self.prompt = re.compile(rb'[\r\n](' + re.escape(self.hostname) +
+                                 rb')(\([\w\-]+\))?([>#]) ?$')
+        self._track(match)
+
+    def _track(self, match):
+        self.mode = match.group(2) or b''
+        self.mode += match.group(3)
+        self.synced = True
+
+    def _enable(self):
+        self._send(b'enable\n')
+        if self.args.get('ENABLE_PASSWD'):
+            self._expect([PASSWORD], LOGIN_TIMEOUT)
+            self._send(str.encode(self.args['ENABLE_PASSWD'] + '\n'))
+        self._read_until_prompt(LOGIN_TIMEOUT)
+
+    def alive(self):
+        if self.conn is None:
+            return False
+        if hasattr(self.conn, 'sock_avail'):  # telnet
+            if self.conn.get_socket() is None or self.conn.eof:
+                return False
+            try:
+                # A readable socket with nothing buffered means the peer closed it.
+                if self.conn.sock_avail() and not self.conn.get_socket().recv(
+                        1, socket.MSG_PEEK):
+                    return False
+            except OSError:
+                return False
+            return True
+        return not self.conn.closed and self.transport.is_active()
+
+    def reconnect(self):
+        if self.transport is not None and self.transport.is_active():
+            # Only the channel is gone; the Transport may carry a pool's other sessions.
+            self._close_conn()
+        else:
+            self.close()
+        return self.open()
+
+    def reset(self):
+        """Bring the CLI back to a clean exec-mode prompt before a check."""
+        if not self.alive():
+            self.reconnect()
+            return
+        try:
+            # Drop whatever a previous read left behind.
+            while self._recv(0):
+                pass
+            if not self.synced:
+                # The last read gave up before the prompt came back.
+                self._send(b'\n')
+                self._read_until_prompt(LOGIN_TIMEOUT)
+            if self.mode.startswith(b'('):
+                self._send(b'end\n')
+                self._read_until_prompt(LOGIN_TIMEOUT)
+            if self.mode == b'>':
+                self._enable()
+        except (OSError, EOFError):
+            self.reconnect()
+
+    def run(self, command, timeout=1):
+        if not self.alive():
+            self.reconnect()
+        try:
+            return self._read(command, timeout)
+        except (OSError, EOFError):
+            self.reconnect()
+            return self._read(command, timeout)
+
+    def run_many(self, commands, parsers=None):
+        """Responses of (command, timeout) pairs, keyed by command.
+
+        A command with a parser in `parsers` is streamed into it row by row
+        and what the parser returns stands in for the response. A command
+        that timed out gets its CommandTimeout instead, so only the rules
+        reading it fail.
+        """
+        parsers = parsers or {}
+        responses = {}
+        for command, timeout in commands:
+            self.reset()
+            try:
+                if command in parsers:
+                    responses[command] = parsers[command](self.lines(command + '\n', timeout))
+                else:
+                    responses[command] = self.run(command + '\n', timeout=timeout)
+            except CommandTimeout as error:
+                responses[command] = error
+        return responses
+
+    def lines(self, command, timeout=1):
+        """Rows of a command's response as they arrive, echo and prompt included.
+
+        Unlike `run`, a connection lost halfway is not retried since the rows
+        read until then are already consumed.
+        """
+        if not self.alive():
+            self.reconnect()
+        rest = b''
+        for chunk in self._stream(command, timeout):
+            buffer, start = rest + chunk, 0
+            end = buffer.find(b'\n')
+            while end >= 0:
+                yield buffer[start:end].rstrip(b'\r').decode('ascii')
+                start, end = end + 1, buffer.find(b'\n', end + 1)
+            rest = buffer[start:]
+        yield rest.decode('ascii')
+
+    def _read(self, command, timeout):
+        return b''.join(self._stream(command, timeout)).decode('ascii')
+
+    def _stream(self, command, timeout):
+        start = time.monotonic()
+        size = 0
+        self._send(str.encode(command))
+        try:
+            for chunk in self._stream_until_prompt(timeout):
+                size += len(chunk)
+                yield chunk
+        finally:
+            self.profile.command(command, time.monotonic() - start, size, self.pages,
+                                 not self.synced)
+        if not self.synced:
+            # What was read is only the start of the output, never parse it as all of it.
+            raise CommandTimeout(colored("'{}' timed out after {}s without the prompt "
+                                         "coming back".format(command.strip(), timeout), "red"))
+
+    def _read_until_prompt(self, timeout):
+        return b''.join(self._stream_until_prompt(timeout))
+
+    def _stream_until_prompt(self, timeout):
+        """Chunks of output until the prompt returns or nothing arrives for `timeout` seconds.
+
+        Only the last TAIL bytes are searched for the prompt and --More--, so
+        reading a large output takes linear time.
+        """
+        self.synced = False
+        self.pages = 0
+        tail = b''
+        received = False
+        while True:
+            data = self._recv(timeout)
+            if data is None:
+                if not received:
+                    return
+                # The output stalled, give it one more timeout to go on.
+                received = False
+                continue
+            received = True
+            tail = (tail + data[-TAIL:])[-TAIL:]
+            match = self.prompt.search(tail)
+            if match:
+                self._track(match)
+                yield data
+                return
+            if MORE.search(tail):
+                self.pages += 1
+                tail = b''
+                self._send(b' ')
+            yield data
+
+    def _close_conn(self):
+        if self.conn is not None:
+            try:
+                self.conn.close()
+            except OSError:
+                pass
+            self.conn = None
+
+    def close(self):
+        self._close_conn()
+        if self.owns_transport:
+            self.transport.close()
+            self.transport = None
+            self.owns_transport = False
+
+
+def check_args(file_args):
+    if "IP" not in file_args:
+        raise Exception("IP should be mentioned in config.json")
+    elif not re.match(r"((25[0-5]|2[0-4][0-9]|[01]?[0-9][0-9]?)(\.|$)){4}",
+                  file_args["IP"]):
+        raise Exception("The IP is not valid.")
+
+    if "PROTOCOL" not in file_args:
+        raise Exception("PROTOCOL should be mentioned in config.json")
+    elif file_args["PROTOCOL"] not in ["telnet", "ssh"]:
+        raise Exception("Invalid protocol. Use telnet or ssh.")
+
+    if file_args["PROTOCOL"] == "ssh":
+        if "USERNAME" not in file_args:
+            raise Exception("USERNAME should be mentioned in config.json")
+        if "SSH_PASSWORD" not in file_args:
+            raise Exception("SSH_PASSWORD should be mentioned in config.json")
+
+    if "SWITCH_PASSWORD" not in file_args:
+        raise Exception("SWITCH_PASSWORD should be mentioned in config.json")
+
+    if "PORT" not in file_args:
+        raise Exception("PORT should be mentioned in config.json")
+    elif int(file_args["PORT"]) != file_args["PORT"] or \
+         int(file_args["PORT"]) not in range(65536):
+        raise Exception("Invalid port.")
+
+    if "SESSIONS" in file_args and (int(file_args["SESSIONS"]) != file_args["SESSIONS"] or
+                                    int(file_args["SESSIONS"]) not in range(1, 17)):
+        raise Exception("SESSIONS should be a number of vty sessions between 1 and 16.")
+
+
+def describe(args):
+    """A device for error messages, without its passwords."""
+    return "{} {}:{}{}".format(args.get("PROTOCOL"), args.get("IP"), args.get("PORT"),
+                               " as " + args["USERNAME"] if args.get("USERNAME") else "")
+
+
+def command_output(response):
+    """A command's response without the echoed command and the trailing prompt."""
+    return '\n'.join(response.split('\n')[1:-1])
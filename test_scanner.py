@@ -0,0 +1,334 @@
+#!/usr/bin/env python3.8
+
+import json
+import pytest
+import parsers
+from audit import audit_file, config_rules
+from cache import ResultCache
+from emulator import Device, Emulator
+from facts import FactsCache, Version
+from findings import JsonLines, Sarif, aggregate
+from fleet import scan_device
+from metrics import Profile
+from monitor import DeviceMonitor
+from pool import make_pool
+from rules import Finding, Scan, all_checks, check_findings
+from running_config import RunningConfig
+from scan import run_checks
+from session import CommandTimeout, check_args
+from transcript import recorded_devices
+
+# Checks the emulated switch is built to fail, see emulator.Device.
+FAILING = {"switchport_port_security", "switchport_port_security_violation", "cdp",
+           "vtp_password", "dtp", "802_1x", "stp_bpduguard", "stp_loopguard",
+           "igmp_snooping"}
+
+
+def device_args(port, protocol="telnet", **extra):
+    args = {"IP": "127.0.0.1", "PORT": port, "PROTOCOL": protocol, "USERNAME": "admin",
+            "SSH_PASSWORD": "p", "SWITCH_PASSWORD": "p", "ENABLE_PASSWD": "p",
+            "NAME": "switch", "SITE": "lab"}
+    args.update(extra)
+    check_args(args)
+    return args
+
+
+def expected(names):
+    return {name: "failed" if name in FAILING else "passed" for name in names}
+
+
+def outcomes(results):
+    return {name: result["result"] for name, result in results.items()}
+
+
+@pytest.fixture(scope="module")
+def emulator():
+    emu = Emulator(Device(), password="p", enable_password="p")
+    _, telnet = emu.serve_telnet()
+    _, ssh = emu.serve_ssh()
+    yield {"telnet": telnet, "ssh": ssh, "stats": emu.stats}
+    emu.stop()
+
+
+@pytest.fixture
+def switch():
+    """A switch of its own over Telnet, for the tests changing its state."""
+    emu = Emulator(Device(), password="p", enable_password="p")
+    _, port = emu.serve_telnet()
+    yield emu.device, device_args(port)
+    emu.stop()
+
+
+@pytest.mark.parametrize("protocol,sessions", [("telnet", 1), ("ssh", 1), ("telnet", 4),
+                                               ("ssh", 4)])
+def test_scan_emulator(emulator, protocol, sessions):
+    names = all_checks()
+    session = make_pool(device_args(emulator[protocol], protocol, SESSIONS=sessions)).open()
+    try:
+        results, found = run_checks(session, names, "switch")
+    finally:
+        session.close()
+    assert outcomes(results) == expected(names)
+    assert all(found[name] for name in FAILING)
+
+
+def test_ssh_pool_reconnects_one_channel(emulator):
+    pool = make_pool(device_args(emulator["ssh"], "ssh", SESSIONS=3)).open()
+    try:
+        logins = emulator["stats"].snapshot()["logins"]
+        pool.sessions[0].conn.close()
+        responses = pool.run_many([("show version", 1), ("show vlan brief", 1),
+                                   ("show dtp", 1), ("show privilege", 1)])
+        assert all("Switch#" in response for response in responses.values())
+        assert all(session.alive() for session in pool.sessions)
+        assert emulator["stats"].snapshot()["logins"] == logins + 1
+    finally:
+        pool.close()
+
+
+def test_timeout_fails_its_rules():
+    class Slow:
+        profile = Profile()
+
+        def run_many(self, commands, parsers=None):
+            return {command: CommandTimeout("'{}' timed out".format(command))
+                    for command, _ in commands}
+
+    scan = Scan(Slow(), {"version": Version("WS-C2960X-48FPD-L", "15.2(7)E4", "")})
+    for name in ("stp_bpduguard", "stp_loopguard"):
+        [finding] = check_findings(scan, name)
+        assert finding.severity == "error" and "timed out" in finding.message
+
+
+def test_result_cache(switch, tmp_path):
+    device, args = switch
+    names = all_checks()
+    cache = ResultCache(str(tmp_path / "results.db"))
+    try:
+        first = scan_device(args, names, cache)
+        assert not first.get("cached") and outcomes(first["checks"]) == expected(names)
+        second = scan_device(args, names, cache)
+        assert second["cached"] and second["checks"] == first["checks"]
+        assert second["findings"] == json.loads(json.dumps(first["findings"]))
+        assert "show running-config" not in second["profile"]["commands"]
+        for interface in device.interfaces:
+            interface["port_security"] = True
+        device.changed, device._config = "10:00:00 UTC Mon Oct 19 2026", None
+        third = scan_device(args, names, cache)
+        assert not third.get("cached") and third["changed"]
+        assert third["checks"]["switchport_port_security"]["result"] == "passed"
+        # A probe the switch rejects never counts as unchanged.
+        rejected = dict(args, CHANGE_PROBE="show configuration id")
+        for _ in range(2):
+            assert not scan_device(rejected, names, cache).get("cached")
+    finally:
+        cache.close()
+
+
+def test_facts_cache(switch, tmp_path):
+    _, args = switch
+    names = all_checks()
+    facts_cache = FactsCache(str(tmp_path / "facts.db"))
+    try:
+        assert facts_cache.lookup(args) is None
+        first = scan_device(args, names, facts_cache=facts_cache)
+        facts = facts_cache.lookup(args)
+        assert facts.model == "WS-C2960X-48FPD-L" and len(facts.interfaces) == 24
+        assert [vlan.number for vlan in facts.vlans][:2] == ["1", "10"]
+        second = scan_device(args, names, facts_cache=facts_cache)
+        assert second["checks"] == first["checks"]
+        assert "show interfaces status" not in second["profile"]["commands"]
+        assert facts_cache.lookup(dict(args, RECORD=str(tmp_path))) is None
+    finally:
+        facts_cache.close()
+    expired = FactsCache(str(tmp_path / "facts.db"), ttl=-1)
+    assert expired.lookup(args) is None
+    expired.close()
+
+
+def test_record_replay(switch, tmp_path):
+    _, args = switch
+    names = all_checks()
+    cache = ResultCache(str(tmp_path / "results.db"))
+    facts_cache = FactsCache(str(tmp_path / "facts.db"))
+    record = dict(args, RECORD=str(tmp_path / "transcripts"))
+    try:
+        live = scan_device(args, names, cache, facts_cache)
+        assert scan_device(args, names, cache, facts_cache)["cached"]
+        recorded = scan_device(record, names, cache, facts_cache)
+        assert not recorded.get("cached") and recorded["checks"] == live["checks"]
+        [device] = recorded_devices(str(tmp_path / "transcripts"))["DEVICES"]
+        # Replayed elsewhere, without the caches, and here, with them.
+        replays = [scan_device(device, names), scan_device(device, names, cache, facts_cache)]
+    finally:
+        cache.close()
+        facts_cache.close()
+    for replayed in replays:
+        assert replayed["status"] == "scanned", replayed.get("error")
+        assert replayed["checks"] == live["checks"]
+
+
+def test_monitor(switch):
+    device, args = switch
+    monitor = DeviceMonitor(args, all_checks(), interval=0.1)
+    try:
+        assert [event["event"] for event in monitor.poll()] == ["scanned"]
+        device.cpu = 90
+        [busy] = monitor.poll()
+        assert busy["event"] == "busy" and busy["cpu"] == 90 and monitor.backoff == 2
+        device.cpu = 5
+        assert [event["event"] for event in monitor.poll()] == ["scanned"]
+        assert monitor.backoff == 1
+        for interface in device.interfaces:
+            interface["port_security"] = True
+        device.changed, device._config = "10:00:00 UTC Mon Oct 19 2026", None
+        events = monitor.poll()
+    finally:
+        monitor.close()
+    drift = [event for event in events if event["event"] == "drift"]
+    assert [event["check"] for event in drift] == ["switchport_port_security"]
+    assert drift[0]["previous"]["result"] == "failed" and drift[0]["result"]["result"] == "passed"
+    commands = monitor.profile.report()["commands"]
+    assert commands["show running-config"]["count"] == 2
+    assert commands["show logging | include %SYS-5-CONFIG_I"]["count"] == 3
+
+
+def test_audit_file(tmp_path):
+    names = config_rules()
+    config = Device().running_config()
+    files = {"good.cfg": config, "empty.cfg": "",
+             "banner.cfg": config.replace("banner motd ^CAuthorized access only^C",
+                                          "banner motd ^C\nAuthorized access only")}
+    for name, text in files.items():
+        (tmp_path / name).write_text(text)
+    (tmp_path / "binary.cfg").write_bytes(bytes(range(256)))
+    good = audit_file(str(tmp_path / "good.cfg"), names)
+    assert good["hostname"] == "Switch" and set(good["checks"]) == set(names)
+    assert good["checks"]["console_password"]["result"] == "passed"
+    for name in ("empty.cfg", "binary.cfg", "banner.cfg"):
+        report = audit_file(str(tmp_path / name), names)
+        assert "error" in report and "checks" not in report
+    assert "never closed" in audit_file(str(tmp_path / "banner.cfg"), names)["error"]
+    assert "error" in audit_file(str(tmp_path / "missing.cfg"), names)
+
+
+def test_findings(tmp_path):
+    findings = [Finding("cdp", "error", "sw1", "CDP is enabled", ("Gi1/0/1", "Gi1/0/2"), (),
+                        "no cdp run")._asdict(),
+                Finding("cdp", "error", "sw2", "CDP is enabled", ("Gi1/0/1",), (),
+                        "no cdp run")._asdict(),
+                Finding("igmp_snooping", "warning", "sw2", "IGMP snooping is off", (),
+                        ("10", "20"), None)._asdict()]
+    writer = JsonLines(str(tmp_path / "findings.jsonl.gz"))
+    writer.write(findings[:1])
+    writer.write(findings[1:])
+    writer.close()
+    summary = aggregate([str(tmp_path / "findings.jsonl.gz")])
+    assert summary["devices"] == 2
+    assert summary["checks"]["cdp"] == {"severity": "error", "findings": 2, "devices": 2,
+                                        "interfaces": 3, "vlans": 0}
+    assert summary["checks"]["igmp_snooping"]["vlans"] == 2
+    sarif = Sarif(str(tmp_path / "findings.sarif"), ["cdp", "igmp_snooping"])
+    sarif.write(findings)
+    sarif.close()
+    with open(str(tmp_path / "findings.sarif")) as file:
+        [run] = json.load(file)["runs"]
+    assert [rule["id"] for rule in run["tool"]["driver"]["rules"]] == ["cdp", "igmp_snooping"]
+    assert [(result["ruleId"], result["level"]) for result in run["results"]] == [
+        ("cdp", "error"), ("cdp", "error"), ("igmp_snooping", "warning")]
+    assert run["results"][0]["locations"][0]["logicalLocations"][2]["fullyQualifiedName"] == \
+        "sw1/Gi1/0/2"
+
+
+def test_running_config_banner():
+    config = RunningConfig("Building configuration...\n\nCurrent configuration : 120 bytes\n"
+                           "!\nhostname sw\n!\nbanner motd ^C\nAuthorized access only\n"
+                           "  violators will be prosecuted\n^C\nbanner login #Login#\n"
+                           "line con 0\n password 7 0822455D0A16\n login\n!\nend\n")
+    assert config.banners == {"motd": "Authorized access only\n"
+                                      "  violators will be prosecuted",
+                              "login": "Login"}
+    assert config.lines == ["hostname sw", "banner motd ^C", "banner login #Login#",
+                            "line con 0"]
+    assert config.block("line con 0") == ["password 7 0822455D0A16", "login"]
+    assert config.include("violators") == ["  violators will be prosecuted"]
+
+
+def test_running_config_rows():
+    config = RunningConfig(iter(["interface GigabitEthernet1/0/1\r\n",
+                                 " switchport mode access\r\n", "!\r\n",
+                                 "interface Vlan1\r\n", " shutdown\r\n", "end\r\n",
+                                 "interface Vlan2\r\n"]))
+    assert config.sections("interface ") == [
+        ("interface GigabitEthernet1/0/1", ["switchport mode access"]),
+        ("interface Vlan1", ["shutdown"])]
+
+
+def test_ip_interfaces():
+    output = """Interface              IP-Address      OK? Method Status                Protocol
+Vlan1                  10.0.0.2        YES NVRAM  up                    up
+Vlan20                 unassigned      YES unset  administratively down down
+GigabitEthernet1/0/1   unassigned      YES unset  down                  down
+Loopback0              10.1.1.1        YES NVRAM  up                    up
+"""
+    assert list(parsers.ip_interfaces(output.split("\n"))) == [
+        parsers.IpInterface("Vlan1", "10.0.0.2", "YES", "NVRAM", "up", "up"),
+        parsers.IpInterface("Vlan20", "unassigned", "YES", "unset", "administratively down",
+                            "down"),
+        parsers.IpInterface("GigabitEthernet1/0/1", "unassigned", "YES", "unset", "down",
+                            "down")]
+
+
+def test_errdisable():
+    output = """ErrDisable Reason            Detection    Mode
+-----------------            ---------    ----
+bpduguard                    Enabled      port
+channel-misconfig (STP)      Enabled      port
+psecure-violation            Enabled      port/vlan
+security-violation           Disabled     port
+"""
+    assert list(parsers.errdisable(output.split("\n"))) == [
+        parsers.ErrdisableCause("bpduguard", "Enabled"),
+        parsers.ErrdisableCause("channel-misconfig (STP)", "Enabled"),
+        parsers.ErrdisableCause("psecure-violation", "Enabled"),
+        parsers.ErrdisableCause("security-violation", "Disabled")]
+
+
+def test_interfaces_and_vlans():
+    status = """Port      Name               Status       Vlan       Duplex  Speed Type
+Gi1/0/1                      connected    10         a-full a-1000 10/100/1000BaseTX
+Gi1/0/2                      notconnect   1            auto   auto 10/100/1000BaseTX
+Fa0/3                        disabled     20           auto   auto 10/100BaseTX
+"""
+    assert list(parsers.interfaces(status.split("\n"))) == [
+        parsers.Interface("Gi1/0/1", "connected"), parsers.Interface("Gi1/0/2", "notconnect"),
+        parsers.Interface("Fa0/3", "disabled")]
+    brief = """VLAN Name                             Status    Ports
+---- -------------------------------- --------- -------------------------------
+1    default                          active    Gi1/0/2
+10   USERS                            active    Gi1/0/1
+30   OLD                              act/lshut
+"""
+    assert list(parsers.vlans(brief.split("\n"))) == [
+        parsers.Vlan("1", "default"), parsers.Vlan("10", "USERS")]
+
+
+def test_igmp_snooping():
+    output = """Global IGMP Snooping configuration:
+-------------------------------------------
+IGMP snooping                       : Enabled
+
+Vlan 1:
+--------
+IGMP snooping                       : Enabled
+
+Vlan 10:
+--------
+IGMP snooping                       : Disabled
+"""
+    assert list(parsers.igmp_snooping(output.split("\n"))) == [
+        parsers.IgmpSnooping("1", True), parsers.IgmpSnooping("10", False)]
+    disabled = output.replace("IGMP snooping                       : Enabled\n\nVlan 1",
+                              "IGMP snooping                       : Disabled\n\nVlan 1")
+    assert list(parsers.igmp_snooping(disabled.split("\n"))) == [
+        parsers.IgmpSnooping("1", False), parsers.IgmpSnooping("10", False)]
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3.8
+
+import gzip
+import json
+import os
+import time
+
+from session import Session
+
+DEVICE_KEYS = ("NAME", "IP", "SITE", "PROTOCOL", "PORT")
+
+
+def transcript_path(directory, device):
+    name = device.get("NAME") or device["IP"]
+    return os.path.join(directory, name.replace(os.sep, "_") + ".json.gz")
+
+
+def load_transcript(path):
+    with gzip.open(path, "rt") as file:
+        return json.load(file)
+
+
+def save_transcript(path, device, hostname, commands):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    transcript = {
+        "device": {key: device[key] for key in DEVICE_KEYS if key in device},
+        "hostname": hostname,
+        "recorded": int(time.time()),
+        "commands": commands,
+    }
+    with gzip.open(path + ".tmp", "wt") as file:
+        json.dump(transcript, file, separators=(",", ":"))
+    os.replace(path + ".tmp", path)
+
+
+class RecordingSession(Session):
+    """Live session that also keeps every command and its raw response.
+
+    The transcript is written to RECORD/<device>.json.gz when the session
+    closes, ready to be served back by ReplaySession.
+    """
+
+    def __init__(self, args):
+        super().__init__(args)
+        self.commands = {}
+
+    def run(self, command, timeout=1):
+        response = super().run(command, timeout=timeout)
+        self.commands[command.strip()] = response
+        return response
+
+    def lines(self, command, timeout=1):
+        rows = []
+        for row in super().lines(command, timeout=timeout):
+            rows.append(row)
+            yield row
+        self.commands[command.strip()] = '\n'.join(rows)
+
+    def close(self):
+        if self.commands:
+            save_transcript(transcript_path(self.args["RECORD"], self.args),
+                            self.args, self.hostname and self.hostname.decode(),
+                            self.commands)
+        super().close()
+
+
+class ReplaySession(Session):
+    """Serves the responses of a recorded transcript instead of a switch."""
+
+    def open(self):
+        transcript = load_transcript(transcript_path(self.args["REPLAY"], self.args))
+        self.hostname = (transcript["hostname"] or "").encode()
+        self.commands = transcript["commands"]
+        self.version = self.commands.get("show version")
+        self.conn = self.commands
+        return self
+
+    def alive(self):
+        return self.conn is not None
+
+    def reset(self):
+        pass
+
+    def run(self, command, timeout=1):
+        try:
+            return self.commands[command.strip()]
+        except KeyError:
+            raise Exception("'{}' was not recorded for {}".format(
+                command.strip(), self.args.get("NAME") or self.args["IP"])) from None
+
+    def lines(self, command, timeout=1):
+        return iter(self.run(command, timeout).replace('\r', '').split('\n'))
+
+    def close(self):
+        self.conn = None
+
+
+def make_session(args):
+    """Session for a device, replaying or recording it when asked to."""
+    if args.get("REPLAY"):
+        return ReplaySession(args)
+    if args.get("RECORD"):
+        return RecordingSession(args)
+    return Session(args)
+
+
+def recorded_devices(directory):
+    """Inventory of every device recorded in a transcript directory."""
+    devices = []
+    for name in sorted(os.listdir(directory)):
+        if name.endswith(".json.gz"):
+            device = load_transcript(os.path.join(directory, name))["device"]
+            device.setdefault("NAME", name[:-len(".json.gz")])
+            device.setdefault("SITE", "default")
+            device["REPLAY"] = directory
+            devices.append(device)
+    return {"DEVICES": devices}